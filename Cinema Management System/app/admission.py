@@ -0,0 +1,235 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from app import models
+from app.auth import get_current_user
+import asyncio
+import logging
+import math
+import os
+import secrets
+import time
+
+logger = logging.getLogger(__name__)
+
+# Контроль допуска на покупку и вход: в пик продаж лишние запросы ждут в очереди или сразу
+# получают 429/503 с Retry-After, а до БД доходит не больше, чем она успевает закоммитить.
+# Скорость 0 отключает соответствующее ограничение.
+ADMISSION_PURCHASE_RATE = float(os.getenv("ADMISSION_PURCHASE_RATE", "50"))
+ADMISSION_PURCHASE_BURST = int(os.getenv("ADMISSION_PURCHASE_BURST", "100"))
+ADMISSION_PURCHASE_USER_RATE = float(os.getenv("ADMISSION_PURCHASE_USER_RATE", "2"))
+ADMISSION_PURCHASE_USER_BURST = int(os.getenv("ADMISSION_PURCHASE_USER_BURST", "5"))
+ADMISSION_LOGIN_RATE = float(os.getenv("ADMISSION_LOGIN_RATE", "20"))
+ADMISSION_LOGIN_BURST = int(os.getenv("ADMISSION_LOGIN_BURST", "40"))
+ADMISSION_LOGIN_USER_RATE = float(os.getenv("ADMISSION_LOGIN_USER_RATE", "0.5"))
+ADMISSION_LOGIN_USER_BURST = int(os.getenv("ADMISSION_LOGIN_USER_BURST", "5"))
+# Очередь ожидающих запросов на каждое ограничение и максимальное ожидание в ней, секунды
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "200"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "5"))
+# Зал ожидания: вместо отказа клиент получает токен с местом в очереди и опрашивает его готовность
+WAITING_ROOM = os.getenv("WAITING_ROOM", "false").lower() in ("1", "true", "yes")
+WAITING_ROOM_SIZE = int(os.getenv("WAITING_ROOM_SIZE", "10000"))
+# Сколько готовый токен ждет повторного запроса, секунды
+WAITING_ROOM_GRACE = float(os.getenv("WAITING_ROOM_GRACE", "30"))
+WAITING_ROOM_HEADER = "X-Waiting-Room-Token"
+# Число отслеживаемых ключей (пользователей, адресов) на ограничение, самые давние вытесняются
+USER_BUCKETS_SIZE = 100000
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+# Корзина токенов: burst запросов сразу, дальше rate в секунду.
+# Токен можно взять в долг - долг и есть очередь: следующий запрос ждет, пока он погасится.
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def reserve(self, now: float) -> float:
+        delay = self.delay(now)
+        self.tokens -= 1
+        return delay
+
+    def cancel(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+class WaitingRoom:
+    def __init__(self, size: int, grace: float):
+        self.size = size
+        self.grace = grace
+        # токен -> (ограничение, время готовности); время готовности растет в порядке выдачи
+        self._tokens: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def _expire(self, now: float):
+        while self._tokens:
+            token, (_, ready_at) = next(iter(self._tokens.items()))
+            if ready_at + self.grace > now:
+                break
+            del self._tokens[token]
+
+    def issue(self, gate: "Gate", now: float) -> Optional[Tuple[str, float]]:
+        self._expire(now)
+        if len(self._tokens) >= self.size:
+            return None
+        # Место в очереди резервируется сразу: токен берется из общей корзины в долг
+        delay = gate.bucket.reserve(now)
+        token = secrets.token_urlsafe(16)
+        self._tokens[token] = (gate.name, now + delay)
+        return token, delay
+
+    def status(self, token: str, now: float) -> Optional[dict]:
+        self._expire(now)
+        entry = self._tokens.get(token)
+        if entry is None:
+            return None
+        gate = gates[entry[0]]
+        wait = max(0.0, entry[1] - now)
+        return {
+            "ready": wait == 0,
+            "position": math.ceil(wait * gate.rate),
+            "retry_after": int(_retry_after(wait)) if wait else 0,
+        }
+
+    def redeem(self, gate: "Gate", token: str, now: float) -> Optional[float]:
+        # Оставшееся ожидание по токену; None - токена нет или он выдан на другое ограничение
+        self._expire(now)
+        entry = self._tokens.get(token)
+        if entry is None or entry[0] != gate.name:
+            return None
+        wait = max(0.0, entry[1] - now)
+        if not wait:
+            del self._tokens[token]
+        return wait
+
+waiting_room = WaitingRoom(WAITING_ROOM_SIZE, WAITING_ROOM_GRACE)
+
+class Gate:
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        user_rate: float,
+        user_burst: int,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        max_wait: float = ADMISSION_MAX_WAIT,
+    ):
+        self.name = name
+        self.rate = rate
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.bucket = TokenBucket(rate, burst, time.monotonic()) if rate > 0 else None
+        self._users: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.queued = 0
+        self.stats = {"admitted": 0, "queued": 0, "limited": 0, "rejected": 0, "redeemed": 0}
+
+    def _user_bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self._users.get(key)
+        if bucket is None:
+            bucket = self._users[key] = TokenBucket(self.user_rate, self.user_burst, now)
+            if len(self._users) > USER_BUCKETS_SIZE:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(key)
+        return bucket
+
+    def _reject(self, now: float, wait: float):
+        self.stats["rejected"] += 1
+        headers = {"Retry-After": _retry_after(wait)}
+        issued = waiting_room.issue(self, now) if WAITING_ROOM else None
+        if issued is not None:
+            token, wait = issued
+            headers = {"Retry-After": _retry_after(wait), WAITING_ROOM_HEADER: token}
+        logger.warning(f"Admission rejected: {self.name}, wait {wait:.1f}s, queue {self.queued}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again later",
+            headers=headers,
+        )
+
+    async def admit(self, key: str, token: Optional[str] = None):
+        now = time.monotonic()
+        if token and WAITING_ROOM:
+            wait = waiting_room.redeem(self, token, now)
+            if wait == 0:
+                # Место по токену уже зарезервировано в общей корзине
+                self.stats["redeemed"] += 1
+                return
+            if wait is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Still in the waiting room",
+                    headers={"Retry-After": _retry_after(wait), WAITING_ROOM_HEADER: token},
+                )
+
+        user_bucket = None
+        if self.user_rate > 0:
+            user_bucket = self._user_bucket(key, now)
+            wait = user_bucket.delay(now)
+            if wait > 0:
+                self.stats["limited"] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests",
+                    headers={"Retry-After": _retry_after(wait)},
+                )
+
+        wait = 0.0
+        if self.bucket is not None:
+            # Отказ сразу, если ждать дольше max_wait или очередь полна
+            wait = self.bucket.delay(now)
+            if wait > self.max_wait or (wait > 0 and self.queued >= self.queue_size):
+                self._reject(now, wait)
+            self.bucket.reserve(now)
+        if user_bucket is not None:
+            user_bucket.reserve(now)
+
+        if wait > 0:
+            # Очередь FIFO: каждый следующий запрос резервирует токен позже предыдущего
+            self.stats["queued"] += 1
+            self.queued += 1
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.bucket.cancel()
+                raise
+            finally:
+                self.queued -= 1
+        self.stats["admitted"] += 1
+
+purchase = Gate(
+    "purchase",
+    ADMISSION_PURCHASE_RATE,
+    ADMISSION_PURCHASE_BURST,
+    ADMISSION_PURCHASE_USER_RATE,
+    ADMISSION_PURCHASE_USER_BURST,
+)
+login = Gate(
+    "login",
+    ADMISSION_LOGIN_RATE,
+    ADMISSION_LOGIN_BURST,
+    ADMISSION_LOGIN_USER_RATE,
+    ADMISSION_LOGIN_USER_BURST,
+)
+gates: Dict[str, Gate] = {gate.name: gate for gate in (purchase, login)}
+
+async def admit_purchase(request: Request, current_user: models.User = Depends(get_current_user)):
+    await purchase.admit(f"user:{current_user.id}", request.headers.get(WAITING_ROOM_HEADER))
+
+async def admit_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    # Вход ограничивается по паре адрес клиента + имя: перебор паролей замедляется, но чужие
+    # попытки с другого адреса не блокируют вход самому пользователю
+    client = request.client.host if request.client else "unknown"
+    await login.admit(f"client:{client}:user:{form_data.username}", request.headers.get(WAITING_ROOM_HEADER))
@@ -1,27 +1,59 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from app.database import get_db
 from app import models
+import asyncio
 import os
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+# Стоимость bcrypt; хеши с другой стоимостью пересчитываются при следующем входе
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Сколько хешей считается одновременно, остальные запросы ждут в очереди пула
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# bcrypt отпускает GIL, поэтому пула потоков достаточно, чтобы не блокировать event loop
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # Возвращает (пароль верный, новый хеш или None, если политика хеширования не менялась)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -32,7 +64,57 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Кэш пользователей по токену: повторные запросы не декодируют JWT и не читают users.
+# Запись живет не дольше PRINCIPAL_CACHE_TTL и не дольше самого токена.
+_principals: "OrderedDict[str, Tuple[float, models.User]]" = OrderedDict()
+_principal_tokens: Dict[int, Set[str]] = {}
+principal_stats = {"hits": 0, "misses": 0}
+
+def _cache_principal(token: str, user: models.User, token_exp: float):
+    # Кэшируется отдельная копия, не привязанная ни к одной сессии БД
+    snapshot = models.User(**{
+        column.key: getattr(user, column.key) for column in inspect(models.User).column_attrs
+    })
+    make_transient_to_detached(snapshot)
+    _principals[token] = (min(time.time() + PRINCIPAL_CACHE_TTL, token_exp), snapshot)
+    _principal_tokens.setdefault(user.id, set()).add(token)
+    while len(_principals) > PRINCIPAL_CACHE_SIZE:
+        _drop_principal(next(iter(_principals)))
+
+def _drop_principal(token: str):
+    entry = _principals.pop(token, None)
+    if entry is not None:
+        tokens = _principal_tokens.get(entry[1].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del _principal_tokens[entry[1].id]
+
+def invalidate_principal(user_id: int):
+    for token in list(_principal_tokens.get(user_id, ())):
+        _drop_principal(token)
+
+@event.listens_for(models.User, "after_update")
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.role.history.has_changes() or state.attrs.is_active.history.has_changes():
+        invalidate_principal(target.id)
+
+@event.listens_for(models.User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    invalidate_principal(target.id)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    entry = _principals.get(token)
+    if entry is not None:
+        if entry[0] > time.time():
+            principal_stats["hits"] += 1
+            _principals.move_to_end(token)
+            # Копия из кэша подключается к сессии запроса без обращения к БД
+            return await db.merge(entry[1], load=False)
+        _drop_principal(token)
+    principal_stats["misses"] += 1
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -46,9 +128,10 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = await db.scalar(select(models.User).where(models.User.username == username))
     if user is None:
         raise credentials_exception
+    _cache_principal(token, user, payload.get("exp", time.time() + PRINCIPAL_CACHE_TTL))
     return user
 
 def require_role(role: str):
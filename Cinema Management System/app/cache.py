@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+from fastapi.responses import Response
+import os
+import time
+
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "1024"))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "60"))
+
+# Кэш готовых JSON-ответов: LRU с ограничением размера и TTL.
+# Каждая запись помечена тегами ("movies", "movie:1", ...), запись в БД сбрасывает записи по тегам.
+class ResponseCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, bytes, Dict[str, str], Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        # Растет при каждой инвалидации: ответ, собранный до записи, не сохраняется после нее
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Response]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, body, headers, tags = entry
+        if expires <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def put(
+        self,
+        key: Hashable,
+        body: bytes,
+        tags: Iterable[str],
+        generation: int,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        headers = headers or {}
+        if generation == self.generation and self.maxsize > 0:
+            tags = tuple(tags)
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body, headers, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self, *tags: str):
+        self.generation += 1
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._tags.clear()
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[3]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+# Каталог: фильмы, залы и сеансы по id
+catalog = ResponseCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL)
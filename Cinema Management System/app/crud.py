@@ -1,24 +1,53 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from app import models, schemas
-from app.auth import get_password_hash
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, delete, func, cast, Float, and_, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from pydantic import ValidationError
+from app import models, schemas, seats, pagination, cache, search, schedule, holds
+from app.auth import hash_password
+from datetime import date, datetime, timedelta
+from typing import Optional, List, Sequence
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Стратегии загрузки связей, которые нужны схемам ответов.
+# Все связи "многие к одному", поэтому грузятся JOIN'ом в том же запросе;
+# в моделях они объявлены raise_on_sql, чтобы ленивая загрузка не прошла незаметно.
+SESSION_LOAD = (
+    joinedload(models.Session.movie),
+    joinedload(models.Session.hall),
+)
+TICKET_LOAD = (
+    joinedload(models.Ticket.session).joinedload(models.Session.movie),
+    joinedload(models.Ticket.session).joinedload(models.Session.hall),
+)
+REVIEW_LOAD = (
+    joinedload(models.Review.user),
+)
+
+# Порядок страниц для курсорной пагинации, последним всегда идет id
+MOVIE_ORDER = (models.Movie.id,)
+MOVIE_SCORE_ORDER = (models.Movie.audience_score, models.Movie.id)
+HALL_ORDER = (models.Hall.id,)
+SESSION_ORDER = (models.Session.start_time, models.Session.id)
+# Отзывы и билеты - от новых к старым
+REVIEW_ORDER = (models.Review.id,)
+TICKET_ORDER = (models.Ticket.id,)
+
 # User CRUD
-def get_user(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.scalar(select(models.User).where(models.User.id == user_id))
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(models.User).filter(models.User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str):
+    return await db.scalar(select(models.User).where(models.User.username == username))
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.User).where(models.User.email == email))
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    hashed_password = await hash_password(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -26,152 +55,644 @@ def create_user(db: Session, user: schemas.UserCreate):
         role=user.role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     logger.info(f"User created: {user.username}")
     return db_user
 
+async def update_password_hash(db: AsyncSession, db_user: models.User, hashed_password: str):
+    db_user.hashed_password = hashed_password
+    await db.commit()
+    logger.info(f"Password rehashed: {db_user.username}")
+    return db_user
+
 # Movie CRUD
-def get_movie(db: Session, movie_id: int):
-    return db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+async def get_movie(db: AsyncSession, movie_id: int):
+    return await db.scalar(select(models.Movie).where(models.Movie.id == movie_id))
 
-def get_movies(
-    db: Session, 
-    skip: int = 0, 
+async def get_movies(
+    db: AsyncSession,
+    skip: int = 0,
     limit: int = 100,
     genre: Optional[str] = None,
-    min_rating: Optional[float] = None
+    min_rating: Optional[float] = None,
+    cursor: Optional[str] = None,
+    min_audience_score: Optional[float] = None,
+    sort: str = "id"
 ):
-    query = db.query(models.Movie)
-    
+    query = select(models.Movie)
+
     if genre:
-        query = query.filter(models.Movie.genre.ilike(f"%{genre}%"))
+        # Частичное совпадение без учета регистра: genre=ci находит Sci-Fi
+        query = query.where(models.Movie.genre.ilike(f"%{genre}%"))
     if min_rating:
-        query = query.filter(models.Movie.rating >= min_rating)
-    
-    return query.offset(skip).limit(limit).all()
+        query = query.where(models.Movie.rating >= min_rating)
+    if min_audience_score:
+        query = query.where(models.Movie.audience_score >= min_audience_score)
 
-def create_movie(db: Session, movie: schemas.MovieCreate):
-    db_movie = models.Movie(**movie.dict())
+    # Сортировка по оценке зрителей - от лучших к худшим, по индексу (audience_score, id)
+    by_score = sort == "audience_score"
+    order = MOVIE_SCORE_ORDER if by_score else MOVIE_ORDER
+    query = pagination.keyset(query, order, cursor, limit, descending=by_score)
+    if not cursor:
+        query = query.offset(skip)
+    rows = (await db.scalars(query)).all()
+    return pagination.make_page(rows, order, limit)
+
+async def create_movie(db: AsyncSession, movie: schemas.MovieCreate):
+    db_movie = models.Movie(**movie.model_dump())
     db.add(db_movie)
-    db.commit()
-    db.refresh(db_movie)
+    await db.commit()
+    await db.refresh(db_movie)
+    cache.catalog.invalidate("movies")
     logger.info(f"Movie created: {movie.title}")
     return db_movie
 
-def update_movie(db: Session, movie_id: int, movie_update: schemas.MovieUpdate):
-    db_movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+async def update_movie(db: AsyncSession, movie_id: int, movie_update: schemas.MovieUpdate):
+    db_movie = await get_movie(db, movie_id)
     if db_movie:
-        update_data = movie_update.dict(exclude_unset=True)
+        update_data = movie_update.model_dump(exclude_unset=True)
+        # Более короткий фильм пересечений не создает, проверяется только удлинение
+        if update_data.get("duration") is not None and update_data["duration"] > db_movie.duration:
+            await schedule.check_movie(db, movie_id, update_data["duration"])
         for field, value in update_data.items():
             setattr(db_movie, field, value)
-        db.commit()
-        db.refresh(db_movie)
+        await db.commit()
+        await db.refresh(db_movie)
+        cache.catalog.invalidate("movies", f"movie:{movie_id}")
         logger.info(f"Movie updated: {db_movie.title}")
     return db_movie
 
-def delete_movie(db: Session, movie_id: int):
-    db_movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+async def delete_movie(db: AsyncSession, movie_id: int):
+    db_movie = await get_movie(db, movie_id)
     if db_movie:
-        db.delete(db_movie)
-        db.commit()
+        session_ids = (await db.scalars(
+            select(models.Session.id).where(models.Session.movie_id == movie_id)
+        )).all()
+        await db.execute(delete(models.SessionSales).where(models.SessionSales.movie_id == movie_id))
+        await db.delete(db_movie)
+        await db.commit()
+        for session_id in session_ids:
+            seats.invalidate(session_id)
+            holds.store.release_session(session_id)
+        cache.catalog.invalidate("movies", f"movie:{movie_id}")
         logger.info(f"Movie deleted: {db_movie.title}")
     return db_movie
 
+async def search_movies(db: AsyncSession, q: str, limit: int = 20):
+    return await search.search_movies(db, q, limit=limit)
+
 # Hall CRUD
-def get_hall(db: Session, hall_id: int):
-    return db.query(models.Hall).filter(models.Hall.id == hall_id).first()
+async def get_hall(db: AsyncSession, hall_id: int):
+    return await db.scalar(select(models.Hall).where(models.Hall.id == hall_id))
 
-def get_halls(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Hall).offset(skip).limit(limit).all()
+async def get_halls(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    query = pagination.keyset(select(models.Hall), HALL_ORDER, cursor, limit)
+    if not cursor:
+        query = query.offset(skip)
+    rows = (await db.scalars(query)).all()
+    return pagination.make_page(rows, HALL_ORDER, limit)
 
-def create_hall(db: Session, hall: schemas.HallCreate):
-    db_hall = models.Hall(**hall.dict())
+async def create_hall(db: AsyncSession, hall: schemas.HallCreate):
+    db_hall = models.Hall(**hall.model_dump())
     db.add(db_hall)
-    db.commit()
-    db.refresh(db_hall)
+    await db.commit()
+    await db.refresh(db_hall)
+    cache.catalog.invalidate("halls")
     logger.info(f"Hall created: {hall.name}")
     return db_hall
 
 # Session CRUD
-def get_session(db: Session, session_id: int):
-    return db.query(models.Session).filter(models.Session.id == session_id).first()
+async def get_session(db: AsyncSession, session_id: int):
+    return await db.scalar(
+        select(models.Session).options(*SESSION_LOAD).where(models.Session.id == session_id)
+    )
 
-def get_sessions(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Session).offset(skip).limit(limit).all()
+async def get_sessions(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    movie_id: Optional[int] = None,
+    hall_id: Optional[int] = None
+):
+    query = select(models.Session).options(*SESSION_LOAD)
+
+    if movie_id is not None:
+        query = query.where(models.Session.movie_id == movie_id)
+    if hall_id is not None:
+        query = query.where(models.Session.hall_id == hall_id)
+    if date_from is not None:
+        query = query.where(models.Session.start_time >= date_from)
+    if date_to is not None:
+        query = query.where(models.Session.start_time < date_to)
+
+    query = pagination.keyset(query, SESSION_ORDER, cursor, limit)
+    if not cursor:
+        query = query.offset(skip)
+    rows = (await db.scalars(query)).all()
+    return pagination.make_page(rows, SESSION_ORDER, limit)
+
+async def _reload_session(db: AsyncSession, session_id: int):
+    # После изменения сеанса movie/hall могли смениться, перечитываем их вместе с сеансом
+    return await db.scalar(
+        select(models.Session)
+        .options(*SESSION_LOAD)
+        .where(models.Session.id == session_id)
+        .execution_options(populate_existing=True)
+    )
 
-def create_session(db: Session, session: schemas.SessionCreate):
-    db_session = models.Session(**session.dict())
+async def create_session(db: AsyncSession, session: schemas.SessionCreate):
+    # Фильм уже загружен роутером, длительность берется из identity map
+    movie = await db.get(models.Movie, session.movie_id)
+    await schedule.check(db, session.hall_id, session.start_time, movie.duration)
+    db_session = models.Session(**session.model_dump())
     db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
+    await db.flush()
+    # Зал тоже загружен роутером
+    hall = await db.get(models.Hall, session.hall_id)
+    db.add(_empty_sales(db_session.id, session, hall.capacity))
+    await db.commit()
     logger.info(f"Session created: {session.movie_id}")
-    return db_session
+    return await _reload_session(db, db_session.id)
+
+# Пачка загрузки расписания: строк в одном INSERT (4 параметра на строку) и id фильмов или залов
+# в одном запросе проверки - не больше 999 параметров на запрос, предел старых версий SQLite
+IMPORT_CHUNK_SIZE = 200
+
+async def import_sessions(db: AsyncSession, rows: List[dict], partial: bool = False):
+    # Пакетная загрузка расписания: все строки проверяются за один проход,
+    # фильмы и залы читаются пачками по IMPORT_CHUNK_SIZE id, вставка - одна транзакция.
+    # Без partial при любой ошибке ничего не вставляется
+    errors = []
+    parsed = []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({"row": number, "error": "Row must be an object"})
+            continue
+        # csv.DictReader складывает лишние поля строки под ключ None
+        if None in row:
+            errors.append({"row": number, "error": "Row has more fields than the header"})
+            continue
+        try:
+            parsed.append((number, schemas.SessionCreate.model_validate(row)))
+        except ValidationError as e:
+            message = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            )
+            errors.append({"row": number, "error": message})
 
-def update_session(db: Session, session_id: int, session_update: schemas.SessionUpdate):
-    db_session = db.query(models.Session).filter(models.Session.id == session_id).first()
+    movie_ids = sorted({session.movie_id for _, session in parsed})
+    hall_ids = sorted({session.hall_id for _, session in parsed})
+    durations, capacities = {}, {}
+    for start in range(0, len(movie_ids), IMPORT_CHUNK_SIZE):
+        durations.update((await db.execute(
+            select(models.Movie.id, models.Movie.duration)
+            .where(models.Movie.id.in_(movie_ids[start:start + IMPORT_CHUNK_SIZE]))
+        )).all())
+    for start in range(0, len(hall_ids), IMPORT_CHUNK_SIZE):
+        capacities.update((await db.execute(
+            select(models.Hall.id, models.Hall.capacity)
+            .where(models.Hall.id.in_(hall_ids[start:start + IMPORT_CHUNK_SIZE]))
+        )).all())
+
+    valid = []
+    for number, session in parsed:
+        if session.movie_id not in durations:
+            errors.append({"row": number, "error": "Movie not found"})
+        elif session.hall_id not in capacities:
+            errors.append({"row": number, "error": "Hall not found"})
+        else:
+            end_time = session.start_time + timedelta(minutes=durations[session.movie_id])
+            valid.append((number, session, end_time))
+
+    # Пересечения проверяются и с сеансами в БД, и между строками загрузки
+    values = []
+    if valid:
+        await schedule.lock_halls(db, {session.hall_id for _, session, _ in valid})
+        timelines = await schedule.load_timelines(
+            db,
+            {session.hall_id for _, session, _ in valid},
+            min(session.start_time for _, session, _ in valid),
+            max(end_time for _, _, end_time in valid)
+        )
+        for number, session, end_time in valid:
+            timeline = timelines[session.hall_id]
+            conflict = timeline.conflict(session.start_time, end_time)
+            if conflict is not None:
+                errors.append({"row": number, "error": f"Hall is busy: overlaps with {conflict}"})
+                continue
+            timeline.add(session.start_time, end_time, f"row {number}")
+            values.append(session)
+
+    errors.sort(key=lambda error: error["row"])
+    if not values or (errors and not partial):
+        return {"created": 0, "ids": [], "errors": errors}
+
+    # Многострочный INSERT ... VALUES ... RETURNING на пачку строк (executemany с RETURNING
+    # в SQLite выполняется построчно). Порядок строк RETURNING не гарантирован, поэтому id
+    # сопоставляются по залу и началу: пересекающиеся сеансы уже отклонены, пара уникальна
+    created = {}
+    for start in range(0, len(values), IMPORT_CHUNK_SIZE):
+        result = await db.execute(
+            insert(models.Session)
+            .values([session.model_dump() for session in values[start:start + IMPORT_CHUNK_SIZE]])
+            .returning(models.Session.id, models.Session.hall_id, models.Session.start_time)
+        )
+        created.update(((row.hall_id, row.start_time), row.id) for row in result)
+    ids = [created[(session.hall_id, session.start_time.replace(tzinfo=None))] for session in values]
+    await db.execute(
+        insert(models.SessionSales),
+        [
+            _sales_values(session_id, session, capacities[session.hall_id])
+            for session_id, session in zip(ids, values)
+        ]
+    )
+    await db.commit()
+    logger.info(f"Sessions imported: {len(ids)}, rejected: {len(errors)}")
+    return {"created": len(ids), "ids": ids, "errors": errors}
+
+async def update_session(db: AsyncSession, session_id: int, session_update: schemas.SessionUpdate):
+    db_session = await get_session(db, session_id)
     if db_session:
-        update_data = session_update.dict(exclude_unset=True)
+        update_data = session_update.model_dump(exclude_unset=True)
+        if update_data.keys() & {"movie_id", "hall_id", "start_time"}:
+            movie = await db.get(models.Movie, update_data.get("movie_id", db_session.movie_id))
+            if movie is None:
+                raise ValueError("Movie not found")
+            await schedule.check(
+                db,
+                update_data.get("hall_id", db_session.hall_id),
+                update_data.get("start_time", db_session.start_time),
+                movie.duration,
+                exclude_id=session_id
+            )
         for field, value in update_data.items():
             setattr(db_session, field, value)
-        db.commit()
-        db.refresh(db_session)
+        if update_data.keys() & {"movie_id", "hall_id", "start_time"}:
+            hall = await db.get(models.Hall, db_session.hall_id)
+            if hall is None:
+                raise ValueError("Hall not found")
+            await db.execute(
+                update(models.SessionSales)
+                .where(models.SessionSales.session_id == session_id)
+                .values(
+                    movie_id=db_session.movie_id,
+                    hall_id=db_session.hall_id,
+                    day=db_session.start_time.date(),
+                    capacity=hall.capacity
+                )
+            )
+        await db.commit()
+        seats.invalidate(session_id)
+        # В другом зале у мест другая нумерация, брони прежнего зала снимаются
+        if "hall_id" in update_data:
+            holds.store.release_session(session_id)
+        cache.catalog.invalidate(f"session:{session_id}")
         logger.info(f"Session updated: {session_id}")
+        db_session = await _reload_session(db, session_id)
     return db_session
 
-def delete_session(db: Session, session_id: int):
-    db_session = db.query(models.Session).filter(models.Session.id == session_id).first()
+async def delete_session(db: AsyncSession, session_id: int):
+    db_session = await get_session(db, session_id)
     if db_session:
-        db.delete(db_session)
-        db.commit()
+        await db.execute(delete(models.SessionSales).where(models.SessionSales.session_id == session_id))
+        await db.delete(db_session)
+        await db.commit()
+        seats.invalidate(session_id)
+        holds.store.release_session(session_id)
+        cache.catalog.invalidate(f"session:{session_id}")
         logger.info(f"Session deleted: {session_id}")
     return db_session
 
 # Ticket CRUD
-def get_ticket(db: Session, ticket_id: int):
-    return db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
+async def get_ticket(db: AsyncSession, ticket_id: int):
+    return await db.scalar(
+        select(models.Ticket).options(*TICKET_LOAD).where(models.Ticket.id == ticket_id)
+    )
 
-def get_user_tickets(db: Session, user_id: int):
-    return db.query(models.Ticket).filter(models.Ticket.user_id == user_id).all()
+async def get_user_tickets(db: AsyncSession, user_id: int, limit: int = 50, cursor: Optional[str] = None):
+    query = select(models.Ticket).options(*TICKET_LOAD).where(models.Ticket.user_id == user_id)
+    query = pagination.keyset(query, TICKET_ORDER, cursor, limit, descending=True)
+    rows = (await db.scalars(query)).all()
+    return pagination.make_page(rows, TICKET_ORDER, limit)
 
-def create_ticket(db: Session, ticket: schemas.TicketCreate, user_id: int):
-    # Проверка на занятость места
-    existing_ticket = db.query(models.Ticket).filter(
-        and_(
-            models.Ticket.session_id == ticket.session_id,
-            models.Ticket.seat_number == ticket.seat_number
-        )
-    ).first()
-    
-    if existing_ticket:
+async def create_ticket(db: AsyncSession, ticket: schemas.TicketCreate, user_id: int):
+    # Сеанс уже загружен роутером, берем его из identity map без запроса
+    db_session = await db.get(models.Session, ticket.session_id, options=SESSION_LOAD)
+    layout = seats.SeatLayout.for_hall(db_session.hall)
+    seat_index = layout.index(ticket.seat_number)
+    seat_number = layout.label(seat_index)
+
+    seat_map = seats.get_cached(ticket.session_id)
+    if seat_map is not None and seat_map.is_taken(seat_index):
         raise ValueError("Seat already taken")
-    
-    db_ticket = models.Ticket(**ticket.dict(), user_id=user_id)
+    if holds.store.check(ticket.session_id, [seat_index], user_id):
+        raise ValueError("Seat is held by another customer")
+
+    # Место занимается вставкой: уникальный индекс (session_id, seat_number)
+    # не дает двум покупателям получить одно место, отдельная проверка не нужна
+    db_ticket = models.Ticket(session=db_session, seat_number=seat_number, user_id=user_id, price=db_session.price)
     db.add(db_ticket)
-    db.commit()
-    db.refresh(db_ticket)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise ValueError("Seat already taken")
+    await _add_to_sales(db, db_session, 1)
+    await db.commit()
+    seats.mark_taken(ticket.session_id, seat_index)
+    # Бронь покупателя превращается в билет
+    holds.store.release_seats(ticket.session_id, [seat_index])
     logger.info(f"Ticket created: user {user_id}, session {ticket.session_id}")
     return db_ticket
 
+async def create_tickets(db: AsyncSession, batch: schemas.TicketBatchCreate, user_id: int):
+    # Все места заказа покупаются одной вставкой в одной транзакции
+    db_session = await db.get(models.Session, batch.session_id, options=SESSION_LOAD)
+    layout = seats.SeatLayout.for_hall(db_session.hall)
+    seat_indexes = [layout.index(seat_number) for seat_number in batch.seat_numbers]
+    if len(set(seat_indexes)) != len(seat_indexes):
+        raise ValueError("Duplicate seat numbers")
+    seat_numbers = [layout.label(index) for index in seat_indexes]
+
+    seat_map = seats.get_cached(batch.session_id)
+    if seat_map is not None and any(seat_map.is_taken(index) for index in seat_indexes):
+        taken = [layout.label(index) for index in seat_indexes if seat_map.is_taken(index)]
+        raise ValueError(f"Seats already taken: {', '.join(sorted(taken))}")
+    held = holds.store.check(batch.session_id, seat_indexes, user_id)
+    if held:
+        raise ValueError(f"Seats held by another customer: {', '.join(sorted(layout.label(index) for index in held))}")
+
+    # Одна вставка на весь заказ; id и время покупки возвращает сама вставка,
+    # а сеанс уже загружен, поэтому билеты не перечитываются
+    try:
+        result = await db.execute(
+            insert(models.Ticket)
+            .values([
+                {"session_id": batch.session_id, "user_id": user_id, "seat_number": seat_number, "price": db_session.price}
+                for seat_number in seat_numbers
+            ])
+            .returning(models.Ticket.id, models.Ticket.seat_number, models.Ticket.purchased_at)
+        )
+    except IntegrityError:
+        await db.rollback()
+        # Запрос занятых мест нужен только для сообщения об ошибке
+        taken = (await db.scalars(select(models.Ticket.seat_number).where(
+            and_(
+                models.Ticket.session_id == batch.session_id,
+                models.Ticket.seat_number.in_(seat_numbers)
+            )
+        ))).all()
+        raise ValueError(f"Seats already taken: {', '.join(sorted(taken))}")
+    inserted = {row.seat_number: row for row in result}
+    await _add_to_sales(db, db_session, len(seat_numbers))
+    await db.commit()
+    db_tickets = [
+        {
+            "id": inserted[seat_number].id,
+            "session_id": batch.session_id,
+            "user_id": user_id,
+            "seat_number": seat_number,
+            "price": db_session.price,
+            "purchased_at": inserted[seat_number].purchased_at,
+            "session": db_session,
+        }
+        for seat_number in seat_numbers
+    ]
+    for index in seat_indexes:
+        seats.mark_taken(batch.session_id, index)
+    holds.store.release_seats(batch.session_id, seat_indexes)
+    logger.info(f"Tickets created: user {user_id}, session {batch.session_id}, seats {len(db_tickets)}")
+    return db_tickets
+
+# Hold CRUD
+def _hold_dict(hold: holds.Hold, layout: seats.SeatLayout) -> dict:
+    return {
+        "id": hold.id,
+        "session_id": hold.session_id,
+        "seat_numbers": [layout.label(index) for index in sorted(hold.seats)],
+        "expires_at": hold.expires_at,
+    }
+
+async def create_hold(db: AsyncSession, db_session: models.Session, hold: schemas.HoldCreate, user_id: int):
+    # Места держатся за покупателем SEAT_HOLD_TTL секунд; проверка и бронь идут без await между ними
+    seat_map = await seats.load(db, db_session)
+    layout = seat_map.layout
+    seat_indexes = [layout.index(seat_number) for seat_number in hold.seat_numbers]
+    if len(set(seat_indexes)) != len(seat_indexes):
+        raise ValueError("Duplicate seat numbers")
+
+    taken = [layout.label(index) for index in seat_indexes if seat_map.is_taken(index)]
+    if taken:
+        raise holds.SeatHeld(f"Seats already taken: {', '.join(sorted(taken))}")
+    held = holds.store.check(db_session.id, seat_indexes, user_id)
+    if held:
+        raise holds.SeatHeld(f"Seats already held: {', '.join(sorted(layout.label(index) for index in held))}")
+
+    db_hold = holds.store.hold(db_session.id, seat_indexes, user_id, schemas.MAX_SEATS_PER_ORDER)
+    logger.info(f"Seats held: user {user_id}, session {db_session.id}, seats {len(seat_indexes)}")
+    return _hold_dict(db_hold, layout)
+
+def get_hold(session_id: int, hold_id: str) -> Optional[holds.Hold]:
+    db_hold = holds.store.get(hold_id)
+    if db_hold is None or db_hold.session_id != session_id:
+        return None
+    return db_hold
+
+def delete_hold(db_hold: holds.Hold):
+    holds.store.release(db_hold)
+    logger.info(f"Hold released: {db_hold.id}, session {db_hold.session_id}")
+
 # Review CRUD
-def get_movie_reviews(db: Session, movie_id: int):
-    return db.query(models.Review).filter(models.Review.movie_id == movie_id).all()
+async def get_movie_reviews(db: AsyncSession, movie_id: int, limit: int = 50, cursor: Optional[str] = None):
+    query = select(models.Review).options(*REVIEW_LOAD).where(models.Review.movie_id == movie_id)
+    query = pagination.keyset(query, REVIEW_ORDER, cursor, limit, descending=True)
+    rows = (await db.scalars(query)).all()
+    return pagination.make_page(rows, REVIEW_ORDER, limit)
 
-def create_review(db: Session, review: schemas.ReviewCreate, user_id: int):
+async def create_review(db: AsyncSession, review: schemas.ReviewCreate, user_id: int):
     # Проверка, что пользователь еще не оставлял отзыв на этот фильм
-    existing_review = db.query(models.Review).filter(
+    existing_review = await db.scalar(select(models.Review.id).where(
         and_(
             models.Review.movie_id == review.movie_id,
             models.Review.user_id == user_id
         )
-    ).first()
-    
+    ))
+
     if existing_review:
         raise ValueError("User already reviewed this movie")
-    
-    db_review = models.Review(**review.dict(), user_id=user_id)
+
+    # Автор уже загружен в get_current_user и берется из identity map
+    db_review = models.Review(**review.model_dump(), user=await db.get(models.User, user_id))
     db.add(db_review)
-    db.commit()
-    db.refresh(db_review)
+    await _add_to_review_stats(db, review.movie_id, review.rating)
+    await db.commit()
+    cache.catalog.invalidate("movies", f"movie:{review.movie_id}")
     logger.info(f"Review created: user {user_id}, movie {review.movie_id}")
-    return db_review
\ No newline at end of file
+    return db_review
+
+# Review aggregates
+async def _add_to_review_stats(db: AsyncSession, movie_id: int, rating: int):
+    # Атомарные инкременты в той же транзакции, что и вставка отзыва
+    movie = models.Movie
+    await db.execute(
+        update(movie)
+        .where(movie.id == movie_id)
+        .values(
+            review_count=movie.review_count + 1,
+            review_sum=movie.review_sum + rating,
+            audience_score=cast(movie.review_sum + rating, Float) / (movie.review_count + 1),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    histogram = models.ReviewHistogram.__table__
+    await db.execute(
+        dialect.insert(histogram)
+        .values(movie_id=movie_id, rating=rating, count=1)
+        .on_conflict_do_update(
+            index_elements=[histogram.c.movie_id, histogram.c.rating],
+            set_={"count": histogram.c.count + 1},
+        )
+    )
+
+async def get_movie_stats(db: AsyncSession, movie_id: int):
+    movie = await get_movie(db, movie_id)
+    if movie is None:
+        return None
+    histogram = {rating: 0 for rating in range(1, 11)}
+    rows = await db.execute(
+        select(models.ReviewHistogram.rating, models.ReviewHistogram.count)
+        .where(models.ReviewHistogram.movie_id == movie_id)
+    )
+    histogram.update(rows.tuples().all())
+    return {
+        "movie_id": movie.id,
+        "review_count": movie.review_count,
+        "review_sum": movie.review_sum,
+        "audience_score": movie.audience_score,
+        "histogram": histogram,
+    }
+
+async def rebuild_review_stats(db: AsyncSession):
+    # Полный пересчет агрегатов по таблице reviews, если они разошлись с данными
+    movie, review = models.Movie, models.Review
+    count = select(func.count()).where(review.movie_id == movie.id).scalar_subquery()
+    total = select(func.coalesce(func.sum(review.rating), 0)).where(review.movie_id == movie.id).scalar_subquery()
+    average = select(func.coalesce(func.avg(review.rating), 0)).where(review.movie_id == movie.id).scalar_subquery()
+    result = await db.execute(
+        update(movie)
+        .values(review_count=count, review_sum=total, audience_score=average)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(delete(models.ReviewHistogram))
+    await db.execute(
+        insert(models.ReviewHistogram).from_select(
+            ["movie_id", "rating", "count"],
+            select(review.movie_id, review.rating, func.count()).group_by(review.movie_id, review.rating),
+        )
+    )
+    await db.commit()
+    cache.catalog.clear()
+    logger.info(f"Review stats rebuilt for {result.rowcount} movies")
+    return result.rowcount
+
+# Sales rollup
+def _sales_values(session_id: int, session, capacity: int, tickets_sold: int = 0, revenue: float = 0.0) -> dict:
+    return {
+        "session_id": session_id,
+        "movie_id": session.movie_id,
+        "hall_id": session.hall_id,
+        "day": session.start_time.date(),
+        "capacity": capacity,
+        "tickets_sold": tickets_sold,
+        "revenue": revenue,
+    }
+
+def _empty_sales(session_id: int, session, capacity: int) -> models.SessionSales:
+    return models.SessionSales(**_sales_values(session_id, session, capacity))
+
+async def _add_to_sales(db: AsyncSession, db_session: models.Session, count: int):
+    # Инкремент в той же транзакции, что и вставка билетов; строки может не быть,
+    # если сеанс создан до появления отчетов. Выручка - по цене, записанной в билеты
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    sales = models.SessionSales.__table__
+    await db.execute(
+        dialect.insert(sales)
+        .values(**_sales_values(db_session.id, db_session, db_session.hall.capacity, count, count * db_session.price))
+        .on_conflict_do_update(
+            index_elements=[sales.c.session_id],
+            set_={
+                "tickets_sold": sales.c.tickets_sold + count,
+                "revenue": sales.c.revenue + count * db_session.price,
+            },
+        )
+    )
+
+REPORT_GROUPS = {
+    "day": (models.SessionSales.day,),
+    "session": (models.SessionSales.session_id,),
+    "movie": (models.SessionSales.movie_id, models.Movie.title.label("movie_title")),
+    "hall": (models.SessionSales.hall_id, models.Hall.name.label("hall_name")),
+}
+
+async def get_sales_report(
+    db: AsyncSession,
+    group_by: Sequence[str],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = 1000
+):
+    # Отчеты читают только session_sales, билеты не сканируются; date_to не включается
+    sales = models.SessionSales
+    keys = [column for group in group_by for column in REPORT_GROUPS[group]]
+    sold = func.sum(sales.tickets_sold)
+    capacity = func.sum(sales.capacity)
+    query = select(
+        *keys,
+        func.count().label("sessions"),
+        sold.label("tickets_sold"),
+        capacity.label("capacity"),
+        func.sum(sales.revenue).label("revenue"),
+        (cast(sold, Float) / func.nullif(capacity, 0)).label("occupancy"),
+    )
+    if "movie" in group_by:
+        query = query.join(models.Movie, sales.movie_id == models.Movie.id)
+    if "hall" in group_by:
+        query = query.join(models.Hall, sales.hall_id == models.Hall.id)
+    if date_from is not None:
+        query = query.where(sales.day >= date_from)
+    if date_to is not None:
+        query = query.where(sales.day < date_to)
+    query = query.group_by(*keys).order_by(*keys).limit(limit)
+    return [
+        {**row._asdict(), "occupancy": row.occupancy or 0.0}
+        for row in await db.execute(query)
+    ]
+
+async def rebuild_sales(db: AsyncSession):
+    # Полный пересчет продаж по сеансам из таблицы tickets, выручка - сумма цен проданных билетов
+    session, ticket = models.Session, models.Ticket
+    sold = (
+        select(ticket.session_id, func.count().label("tickets_sold"), func.sum(ticket.price).label("revenue"))
+        .group_by(ticket.session_id)
+        .subquery()
+    )
+    await db.execute(delete(models.SessionSales))
+    result = await db.execute(
+        insert(models.SessionSales).from_select(
+            ["session_id", "movie_id", "hall_id", "day", "capacity", "tickets_sold", "revenue"],
+            select(
+                session.id, session.movie_id, session.hall_id, func.date(session.start_time), models.Hall.capacity,
+                func.coalesce(sold.c.tickets_sold, 0), func.coalesce(sold.c.revenue, 0),
+            )
+            .join(models.Hall, session.hall_id == models.Hall.id)
+            .outerjoin(sold, sold.c.session_id == session.id),
+        )
+    )
+    await db.commit()
+    logger.info(f"Sales rebuilt for {result.rowcount} sessions")
+    return result.rowcount
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -8,17 +10,34 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./cinema.db")
 
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False} 
-)
+# Синхронный и асинхронный драйверы для каждого бэкенда.
+# В DATABASE_URL можно указать любой из них, второй URL строится автоматически.
+SYNC_DRIVERS = {"sqlite": "pysqlite", "postgresql": "psycopg2"}
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+def _split_url(url: str):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if url.get_driver_name() == ASYNC_DRIVERS.get(backend):
+        return url.set(drivername=f"{backend}+{SYNC_DRIVERS[backend]}"), url
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported database backend: {backend}")
+    return url, url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+SYNC_DATABASE_URL, ASYNC_DATABASE_URL = _split_url(DATABASE_URL)
+
+connect_args = {"check_same_thread": False} if SYNC_DATABASE_URL.get_backend_name() == "sqlite" else {}
+
+# Синхронный движок используется скриптами (seed.py, создание таблиц)
+engine = create_engine(SYNC_DATABASE_URL, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок используется API, чтобы запросы не блокировали event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=connect_args)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
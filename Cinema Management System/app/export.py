@@ -0,0 +1,76 @@
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from sqlalchemy import select
+from app import models
+from app.database import AsyncSessionLocal
+import csv
+import io
+import json
+import os
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Выгрузка продаж плоскими строками без ORM-объектов: память не зависит от размера выгрузки
+EXPORT_COLUMNS = (
+    models.Ticket.id.label("ticket_id"),
+    models.Ticket.purchased_at,
+    models.Ticket.seat_number,
+    models.Ticket.user_id,
+    models.User.username,
+    models.Ticket.session_id,
+    models.Session.start_time,
+    models.Ticket.price,
+    models.Session.movie_id,
+    models.Movie.title.label("movie_title"),
+    models.Session.hall_id,
+    models.Hall.name.label("hall_name"),
+)
+FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+def tickets_query(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    session_id: Optional[int] = None
+):
+    # Фильтр по дате покупки: date_from включительно, date_to - нет
+    query = (
+        select(*EXPORT_COLUMNS)
+        .join(models.User, models.Ticket.user_id == models.User.id)
+        .join(models.Session, models.Ticket.session_id == models.Session.id)
+        .join(models.Movie, models.Session.movie_id == models.Movie.id)
+        .join(models.Hall, models.Session.hall_id == models.Hall.id)
+    )
+    if date_from is not None:
+        query = query.where(models.Ticket.purchased_at >= date_from)
+    if date_to is not None:
+        query = query.where(models.Ticket.purchased_at < date_to)
+    if session_id is not None:
+        query = query.where(models.Ticket.session_id == session_id)
+    return query.order_by(models.Ticket.purchased_at, models.Ticket.id)
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _ndjson(rows) -> bytes:
+    return "".join(
+        json.dumps({field: _value(value) for field, value in zip(FIELDS, row)}, ensure_ascii=False) + "\n"
+        for row in rows
+    ).encode()
+
+def _csv(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(FIELDS)
+    writer.writerows([_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+async def stream_tickets(query, format: str = "ndjson") -> AsyncIterator[bytes]:
+    # Ответ отдается после выхода из зависимостей, поэтому у выгрузки своя сессия БД.
+    # Строки читаются курсором пачками по EXPORT_BATCH_SIZE, каждая пачка сразу уходит клиенту
+    if format == "csv":
+        yield _csv((), header=True)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield _csv(rows) if format == "csv" else _ndjson(rows)
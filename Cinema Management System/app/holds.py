@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+import math
+import os
+import secrets
+import time
+
+# Временная бронь мест на время оформления заказа
+SEAT_HOLD_TTL = float(os.getenv("SEAT_HOLD_TTL", "300"))
+# Точность истечения брони, секунды
+SEAT_HOLD_TICK = float(os.getenv("SEAT_HOLD_TICK", "1"))
+
+class SeatHeld(ValueError):
+    pass
+
+class Hold:
+    __slots__ = ("id", "session_id", "user_id", "seats", "expires", "expires_at")
+
+    def __init__(self, session_id: int, user_id: int, seats: Set[int], ttl: float):
+        self.id = secrets.token_urlsafe(12)
+        self.session_id = session_id
+        self.user_id = user_id
+        self.seats = seats
+        self.expires = time.monotonic() + ttl
+        self.expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+
+# Колесо таймеров: слот на каждый тик, бронь кладется в слот тика, в котором истекает.
+# Поворот колеса снимает все брони истекших слотов разом, отдельных таймеров на бронь нет.
+class TimingWheel:
+    def __init__(self, tick: float, span: float):
+        self.tick = tick
+        self.slots: List[Set[str]] = [set() for _ in range(int(span / tick) + 2)]
+        self.current = int(time.monotonic() // tick)
+
+    def add(self, hold_id: str, expires: float):
+        self.slots[math.ceil(expires / self.tick) % len(self.slots)].add(hold_id)
+
+    def advance(self, now: float) -> List[str]:
+        target = int(now // self.tick)
+        expired = []
+        for step in range(1, min(target - self.current, len(self.slots)) + 1):
+            slot = self.slots[(self.current + step) % len(self.slots)]
+            expired.extend(slot)
+            slot.clear()
+        self.current = max(self.current, target)
+        return expired
+
+class HoldStore:
+    def __init__(self, ttl: float = SEAT_HOLD_TTL, tick: float = SEAT_HOLD_TICK):
+        self.ttl = ttl
+        self._holds: Dict[str, Hold] = {}
+        # session_id -> индекс места -> бронь: проверка места за O(1)
+        self._seats: Dict[int, Dict[int, Hold]] = {}
+        self._wheel = TimingWheel(tick, ttl)
+
+    def _expire(self):
+        for hold_id in self._wheel.advance(time.monotonic()):
+            hold = self._holds.get(hold_id)
+            if hold is not None:
+                self._drop(hold, hold.seats)
+
+    def _drop(self, hold: Hold, indexes: Iterable[int]):
+        session_seats = self._seats.get(hold.session_id, {})
+        for index in list(indexes):
+            if session_seats.get(index) is hold:
+                del session_seats[index]
+            hold.seats.discard(index)
+        if not session_seats:
+            self._seats.pop(hold.session_id, None)
+        if not hold.seats:
+            self._holds.pop(hold.id, None)
+
+    def held(self, session_id: int) -> Dict[int, Hold]:
+        self._expire()
+        return self._seats.get(session_id, {})
+
+    def check(self, session_id: int, indexes: Iterable[int], user_id: int) -> List[int]:
+        # Места, забронированные другими покупателями
+        session_seats = self.held(session_id)
+        return [
+            index for index in indexes
+            if index in session_seats and session_seats[index].user_id != user_id
+        ]
+
+    def hold(self, session_id: int, indexes: Iterable[int], user_id: int, max_seats: int) -> Hold:
+        indexes = set(indexes)
+        blocked = self.check(session_id, indexes, user_id)
+        if blocked:
+            raise SeatHeld("Seats already held")
+        session_seats = self._seats.get(session_id, {})
+        # Свои брони на этот сеанс не суммируются сверх лимита заказа; повторная бронь места переносит его
+        own = {index for index, hold in session_seats.items() if hold.user_id == user_id}
+        if len(own | indexes) > max_seats:
+            raise ValueError(f"At most {max_seats} seats can be held per session")
+        for index in indexes & own:
+            self._drop(session_seats[index], [index])
+
+        hold = Hold(session_id, user_id, indexes, self.ttl)
+        self._holds[hold.id] = hold
+        session_seats = self._seats.setdefault(session_id, {})
+        for index in indexes:
+            session_seats[index] = hold
+        self._wheel.add(hold.id, hold.expires)
+        return hold
+
+    def get(self, hold_id: str) -> Optional[Hold]:
+        self._expire()
+        return self._holds.get(hold_id)
+
+    def release(self, hold: Hold):
+        self._drop(hold, hold.seats)
+
+    def release_seats(self, session_id: int, indexes: Iterable[int]):
+        # Купленные места снимаются с брони
+        session_seats = self._seats.get(session_id, {})
+        for index in indexes:
+            hold = session_seats.get(index)
+            if hold is not None:
+                self._drop(hold, [index])
+
+    def release_session(self, session_id: int):
+        for hold in set(self._seats.get(session_id, {}).values()):
+            self._drop(hold, list(hold.seats))
+
+# Брони живут в памяти процесса; продажу одного места дважды по-прежнему исключает уникальный индекс в БД
+store = HoldStore()
@@ -0,0 +1,76 @@
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import atexit
+import logging
+import os
+import queue
+import random
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Доля успешных запросов, попадающих в лог доступа; ошибки и медленные запросы пишутся всегда
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+
+access_logger = logging.getLogger("app.access")
+
+_listener: Optional[QueueListener] = None
+
+def setup_logging():
+    # Обработчики пишут в отдельном потоке: event loop только кладет запись в очередь
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+
+# Лог доступа как чистое ASGI middleware: без обертки BaseHTTPMiddleware и одна строка на запрос
+class RequestLoggingMiddleware:
+    def __init__(self, app, sample_rate: float = ACCESS_LOG_SAMPLE_RATE, slow_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.log(scope, status_code, (time.perf_counter() - start) * 1000)
+
+    def log(self, scope, status_code: int, elapsed_ms: float):
+        if status_code >= 500:
+            level = logging.ERROR
+        elif status_code >= 400 or elapsed_ms >= self.slow_ms:
+            level = logging.WARNING
+        elif self.sample_rate >= 1 or random.random() < self.sample_rate:
+            level = logging.INFO
+        else:
+            return
+        if not access_logger.isEnabledFor(level):
+            return
+        path = scope["path"]
+        if scope["query_string"]:
+            path = f"{path}?{scope['query_string'].decode('latin-1')}"
+        access_logger.log(level, f"{scope['method']} {path} {status_code} {elapsed_ms:.1f}ms")
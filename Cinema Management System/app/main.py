@@ -1,31 +1,36 @@
+from app import startup
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from sqlalchemy.exc import SQLAlchemyError
 import logging
-import time
 
-from app.routers import auth, movies, sessions, tickets, reviews, halls
-from app.database import engine
-from app import models
+from app.routers import auth, movies, sessions, tickets, reviews, halls, reports, waiting_room
+from app import cache, metrics, querystats
+from app.logs import RequestLoggingMiddleware, setup_logging
+from app.serialization import DefaultResponse
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Создание таблиц
-models.Base.metadata.create_all(bind=engine)
+# Импорт приложения ничего не пишет в БД: схема создается миграциями (python manage.py migrate),
+# а логирование, пул соединений и кэши готовятся при старте каждого воркера
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    await startup.run()
+    yield
 
 app = FastAPI(
     title="Cinema Management System",
     description="API для управления кинотеатром с аутентификацией и ролями пользователей",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=DefaultResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -35,23 +40,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-DB-Queries", "X-DB-Time", "Retry-After", "X-Waiting-Room-Token"],
 )
 
-# Middleware для логирования запросов
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    
-    # Логируем входящий запрос
-    logger.info(f"Request: {request.method} {request.url}")
-    
-    response = await call_next(request)
-    
-    # Логируем время выполнения
-    process_time = time.time() - start_time
-    logger.info(f"Response: {response.status_code} - {process_time:.3f}s")
-    
-    return response
+# Лог доступа: одна строка на запрос
+app.add_middleware(RequestLoggingMiddleware)
+# Метрики запросов для /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+# Число SQL-запросов и время в БД на каждый запрос
+app.add_middleware(querystats.QueryStatsMiddleware)
 
 # Обработка ошибок валидации
 @app.exception_handler(RequestValidationError)
@@ -59,7 +56,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     logger.warning(f"Validation error: {exc.errors()}")
     return JSONResponse(
         status_code=status.HTTP_400_BAD_REQUEST,
-        content={"detail": "Validation error", "errors": exc.errors()}
+        content={"detail": "Validation error", "errors": jsonable_encoder(exc.errors())}
     )
 
 # Обработка ошибок базы данных
@@ -78,6 +75,8 @@ app.include_router(sessions.router)
 app.include_router(tickets.router)
 app.include_router(reviews.router)
 app.include_router(halls.router)
+app.include_router(reports.router)
+app.include_router(waiting_room.router)
 
 @app.get("/")
 async def root():
@@ -91,6 +90,16 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"catalog": cache.catalog.stats()}
+
+startup.imported()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,190 @@
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+from app import admission, auth, cache, seats, startup
+from app.database import async_engine
+import time
+
+# Метрики в текстовом формате Prometheus. Задержки считаются по шаблону маршрута
+# (/api/movies/{movie_id}), а не по URL, чтобы число рядов не зависело от id в запросах.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str, lines: List[str]):
+        prefix = f"{labels}," if labels else ""
+        suffix = f"{{{labels}}}" if labels else ""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {total}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+
+requests_total: Dict[Tuple[str, str, int], int] = {}
+request_duration: Dict[Tuple[str, str], Histogram] = {}
+in_flight = 0
+pool_checkout = Histogram()
+query_duration = Histogram(QUERY_BUCKETS)
+queries_per_request = Histogram(QUERY_COUNT_BUCKETS)
+slow_queries = 0
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def instrument_pool(pool):
+    # Время получения соединения: ожидание свободного соединения в пуле или подключение к БД
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            pool_checkout.observe(time.perf_counter() - start)
+
+    pool.connect = timed_connect
+
+instrument_pool(async_engine.sync_engine.pool)
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight -= 1
+            # Маршрут кладет в scope роутер FastAPI; запросы мимо маршрутов собираются в один ряд
+            route = scope.get("route")
+            template = getattr(route, "path_format", None) or "unmatched"
+            method = scope["method"]
+            key = (method, template, status_code)
+            requests_total[key] = requests_total.get(key, 0) + 1
+            histogram = request_duration.get((method, template))
+            if histogram is None:
+                histogram = request_duration[(method, template)] = Histogram()
+            histogram.observe(time.perf_counter() - start)
+            startup.first_request_done()
+
+def _cache_stats() -> Dict[str, Tuple[int, int]]:
+    return {
+        "catalog": (cache.catalog.hits, cache.catalog.misses),
+        "principal": (auth.principal_stats["hits"], auth.principal_stats["misses"]),
+        "seat_map": (seats.stats["hits"], seats.stats["misses"]),
+    }
+
+def render() -> str:
+    lines = []
+
+    lines.append("# HELP http_requests_total HTTP requests by route template and status code")
+    lines.append("# TYPE http_requests_total counter")
+    for (method, template, status_code), count in sorted(requests_total.items()):
+        lines.append(
+            f'http_requests_total{{method="{method}",route="{_label(template)}",status="{status_code}"}} {count}'
+        )
+
+    lines.append("# HELP http_request_errors_total HTTP responses with status 5xx")
+    lines.append("# TYPE http_request_errors_total counter")
+    errors = sum(count for (_, _, status_code), count in requests_total.items() if status_code >= 500)
+    lines.append(f"http_request_errors_total {errors}")
+
+    lines.append("# HELP http_request_duration_seconds HTTP request latency by route template")
+    lines.append("# TYPE http_request_duration_seconds histogram")
+    for (method, template), histogram in sorted(request_duration.items()):
+        histogram.render("http_request_duration_seconds", f'method="{method}",route="{_label(template)}"', lines)
+
+    lines.append("# HELP http_requests_in_flight HTTP requests being processed")
+    lines.append("# TYPE http_requests_in_flight gauge")
+    lines.append(f"http_requests_in_flight {in_flight}")
+
+    lines.append("# HELP app_startup_seconds Startup phases: import, lifespan, first request")
+    lines.append("# TYPE app_startup_seconds gauge")
+    for phase, seconds in startup.timings.items():
+        lines.append(f'app_startup_seconds{{phase="{phase}"}} {seconds}')
+
+    lines.append("# HELP db_pool_checkout_seconds Time to get a database connection from the pool")
+    lines.append("# TYPE db_pool_checkout_seconds histogram")
+    pool_checkout.render("db_pool_checkout_seconds", "", lines)
+
+    lines.append("# HELP db_query_duration_seconds SQL statement execution time")
+    lines.append("# TYPE db_query_duration_seconds histogram")
+    query_duration.render("db_query_duration_seconds", "", lines)
+
+    lines.append("# HELP db_queries_per_request SQL statements executed per HTTP request")
+    lines.append("# TYPE db_queries_per_request histogram")
+    queries_per_request.render("db_queries_per_request", "", lines)
+
+    lines.append("# HELP db_slow_queries_total SQL statements slower than SLOW_QUERY_MS")
+    lines.append("# TYPE db_slow_queries_total counter")
+    lines.append(f"db_slow_queries_total {slow_queries}")
+
+    # NullPool (SQLite) не держит соединений, размер есть только у QueuePool
+    pool = async_engine.pool
+    if hasattr(pool, "checkedout"):
+        for name, value, help_text in (
+            ("db_pool_size", pool.size(), "Configured pool size"),
+            ("db_pool_checked_out", pool.checkedout(), "Connections in use"),
+            ("db_pool_checked_in", pool.checkedin(), "Idle connections in the pool"),
+            ("db_pool_overflow", pool.overflow(), "Connections above the pool size"),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+
+    lines.append("# HELP admission_requests_total Admission control decisions by gate")
+    lines.append("# TYPE admission_requests_total counter")
+    for gate in admission.gates.values():
+        for result, count in gate.stats.items():
+            lines.append(f'admission_requests_total{{gate="{gate.name}",result="{result}"}} {count}')
+    lines.append("# HELP admission_queue_length Requests waiting for admission")
+    lines.append("# TYPE admission_queue_length gauge")
+    for gate in admission.gates.values():
+        lines.append(f'admission_queue_length{{gate="{gate.name}"}} {gate.queued}')
+
+    stats = _cache_stats()
+    for name, index, help_text in (
+        ("cache_hits_total", 0, "Cache hits"),
+        ("cache_misses_total", 1, "Cache misses"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for cache_name, counts in stats.items():
+            lines.append(f'{name}{{cache="{cache_name}"}} {counts[index]}')
+    lines.append("# HELP cache_hit_ratio Share of cache lookups served from the cache")
+    lines.append("# TYPE cache_hit_ratio gauge")
+    for cache_name, (hits, misses) in stats.items():
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        lines.append(f'cache_hit_ratio{{cache="{cache_name}"}} {ratio}')
+
+    return "\n".join(lines) + "\n"
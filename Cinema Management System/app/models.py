@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -19,6 +19,9 @@ class User(Base):
 
 class Movie(Base):
     __tablename__ = "movies"
+    __table_args__ = (
+        Index("ix_movies_audience_score_id", "audience_score", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False, index=True)
@@ -26,11 +29,18 @@ class Movie(Base):
     duration = Column(Integer, nullable=False)  # в минутах
     rating = Column(Float, nullable=False)
     description = Column(Text)
+    # Агрегаты отзывов, обновляются вместе с созданием отзыва
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    review_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    audience_score = Column(Float, nullable=False, default=0, server_default="0")  # средняя оценка зрителей
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     sessions = relationship("Session", back_populates="movie", cascade="all, delete-orphan")
     reviews = relationship("Review", back_populates="movie", cascade="all, delete-orphan")
+    review_histogram = relationship(
+        "ReviewHistogram", back_populates="movie", cascade="all, delete-orphan", lazy="raise_on_sql"
+    )
 
 class Hall(Base):
     __tablename__ = "halls"
@@ -38,11 +48,18 @@ class Hall(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     capacity = Column(Integer, nullable=False)
+    rows = Column(Integer, nullable=False, default=1, server_default="1")
     
     sessions = relationship("Session", back_populates="hall")
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Расписание: по времени, по фильму и по залу, везде в порядке (start_time, id)
+        Index("ix_sessions_start_time_id", "start_time", "id"),
+        Index("ix_sessions_movie_id_start_time", "movie_id", "start_time", "id"),
+        Index("ix_sessions_hall_id_start_time", "hall_id", "start_time", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     movie_id = Column(Integer, ForeignKey("movies.id"), nullable=False)
@@ -51,24 +68,35 @@ class Session(Base):
     price = Column(Float, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    movie = relationship("Movie", back_populates="sessions")
-    hall = relationship("Hall", back_populates="sessions")
+    movie = relationship("Movie", back_populates="sessions", lazy="raise_on_sql")
+    hall = relationship("Hall", back_populates="sessions", lazy="raise_on_sql")
     tickets = relationship("Ticket", back_populates="session", cascade="all, delete-orphan")
 
 class Ticket(Base):
     __tablename__ = "tickets"
+    __table_args__ = (
+        # Одно место сеанса продается один раз, гарантирует сама БД
+        UniqueConstraint("session_id", "seat_number", name="uq_tickets_session_seat"),
+        Index("ix_tickets_user_id_id", "user_id", "id"),
+        # Выгрузка продаж за период идет по дате покупки
+        Index("ix_tickets_purchased_at_id", "purchased_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     seat_number = Column(String, nullable=False)
+    price = Column(Float, nullable=False)  # цена на момент покупки
     purchased_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    session = relationship("Session", back_populates="tickets")
+    session = relationship("Session", back_populates="tickets", lazy="raise_on_sql")
     user = relationship("User", back_populates="tickets")
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        Index("ix_reviews_movie_id_id", "movie_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     movie_id = Column(Integer, ForeignKey("movies.id"), nullable=False)
@@ -78,4 +106,28 @@ class Review(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     movie = relationship("Movie", back_populates="reviews")
-    user = relationship("User", back_populates="reviews")
\ No newline at end of file
+    user = relationship("User", back_populates="reviews", lazy="raise_on_sql")
+
+class ReviewHistogram(Base):
+    __tablename__ = "review_histogram"
+    
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    rating = Column(Integer, primary_key=True)  # 1-10
+    count = Column(Integer, nullable=False, default=0)
+    
+    movie = relationship("Movie", back_populates="review_histogram")
+
+class SessionSales(Base):
+    # Продажи по сеансу для отчетов: обновляются при покупке билетов, измерения скопированы из сеанса
+    __tablename__ = "session_sales"
+    __table_args__ = (
+        Index("ix_session_sales_day", "day"),
+    )
+    
+    session_id = Column(Integer, ForeignKey("sessions.id"), primary_key=True)
+    movie_id = Column(Integer, ForeignKey("movies.id"), nullable=False)
+    hall_id = Column(Integer, ForeignKey("halls.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    capacity = Column(Integer, nullable=False)
+    tickets_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
@@ -0,0 +1,50 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence
+from sqlalchemy import tuple_
+import json
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+# Курсор - непрозрачная строка с ключом сортировки последней строки страницы, например (start_time, id)
+def encode_cursor(values: Sequence[Any]) -> str:
+    data = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    try:
+        data = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(data, list) or len(data) != len(columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if column.type.python_type is datetime else column.type.python_type(value)
+            for column, value in zip(columns, data)
+        ]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def keyset(query, columns: Sequence, cursor: Optional[str], limit: int, descending: bool = False):
+    # Поиск по индексу с позиции курсора вместо OFFSET: глубокие страницы стоят как первая
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if len(columns) == 1:
+            key, value = columns[0], values[0]
+        else:
+            key, value = tuple_(*columns), tuple_(*values)
+        query = query.where(key < value if descending else key > value)
+    order = [column.desc() if descending else column for column in columns]
+    # Лишняя строка показывает, есть ли следующая страница
+    return query.order_by(*order).limit(limit + 1)
+
+def make_page(rows: Sequence, columns: Sequence, limit: int) -> Page:
+    items = list(rows[:limit])
+    # Пустая страница (в том числе при limit <= 0) курсора не дает
+    if not items:
+        return Page(items, None)
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return Page(items, next_cursor)
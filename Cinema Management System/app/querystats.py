@@ -0,0 +1,88 @@
+from contextvars import ContextVar
+from typing import Dict, Optional
+from sqlalchemy import event
+from app import metrics
+from app.database import async_engine
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# SQL_DEBUG включает заголовки X-DB-Queries / X-DB-Time и поиск N+1, для разработки
+SQL_DEBUG = os.getenv("SQL_DEBUG", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+# Параметры в логе медленных запросов обрезаются до этой длины
+MAX_LOGGED_PARAMS = 500
+
+class RequestQueries:
+    __slots__ = ("method", "path", "count", "total", "statements")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.count = 0
+        self.total = 0.0
+        self.statements: Dict[str, int] = {}
+
+# Статистика текущего запроса; события движка выполняются в контексте задачи запроса
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    metrics.query_duration.observe(elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        metrics.slow_queries += 1
+        params = repr(parameters)
+        if len(params) > MAX_LOGGED_PARAMS:
+            params = params[:MAX_LOGGED_PARAMS] + "..."
+        logger.warning(f"Slow query {elapsed * 1000:.1f}ms: {statement} params={params}")
+
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.count += 1
+    stats.total += elapsed
+    if SQL_DEBUG:
+        # Одинаковый текст запроса с разными параметрами - признак загрузки связей по одной строке
+        repeats = stats.statements.get(statement, 0) + 1
+        stats.statements[statement] = repeats
+        if repeats == N_PLUS_ONE_THRESHOLD:
+            logger.warning(
+                f"Possible N+1: statement repeated {repeats} times in {stats.method} {stats.path}: {statement}"
+            )
+
+class QueryStatsMiddleware:
+    def __init__(self, app, debug: bool = SQL_DEBUG):
+        self.app = app
+        self.debug = debug
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueries(scope["method"], scope["path"])
+        token = _current.set(stats)
+
+        async def send_wrapper(message):
+            if self.debug and message["type"] == "http.response.start":
+                # Запросы после начала ответа (потоковые выгрузки) в заголовки не попадают
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-db-queries", str(stats.count).encode()),
+                    (b"x-db-time", f"{stats.total * 1000:.1f}ms".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            metrics.queries_per_request.observe(stats.count)
@@ -1,25 +1,30 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app import crud, schemas
-from app.auth import verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app import crud, schemas, admission
+from app.auth import verify_and_update_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
-@router.post("/login", response_model=schemas.Token)
+@router.post("/login", response_model=schemas.Token, dependencies=[Depends(admission.admit_login)])
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = crud.get_user_by_username(db, form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await crud.get_user_by_username(db, form_data.username)
+    if user:
+        is_valid, new_hash = await verify_and_update_password(form_data.password, user.hashed_password)
+    if not user or not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Хеш со старой стоимостью bcrypt прозрачно пересчитываем
+    if new_hash:
+        await crud.update_password_hash(db, user, new_hash)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
@@ -27,17 +32,17 @@ async def login(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=schemas.User)
-async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, user.username)
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await crud.get_user_by_username(db, user.username)
     if db_user:
         raise HTTPException(
             status_code=400,
             detail="Username already registered"
         )
-    db_user = crud.get_user_by_email(db, user.email)
+    db_user = await crud.get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
-    return crud.create_user(db=db, user=user)
\ No newline at end of file
+    return await crud.create_user(db=db, user=user)
\ No newline at end of file
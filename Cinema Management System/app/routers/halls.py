@@ -1,23 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
+from typing import List, Optional
 from app.database import get_db
-from app import crud, schemas, models
+from app import crud, schemas, models, cache
 from app.auth import require_role
 
 router = APIRouter(prefix="/api/halls", tags=["halls"])
 
+HallListAdapter = TypeAdapter(List[schemas.Hall])
+
 @router.get("/", response_model=List[schemas.Hall])
 async def read_halls(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.get_halls(db, skip=skip, limit=limit)
+    key = ("halls", skip, limit, cursor)
+    cached = cache.catalog.get(key)
+    if cached is not None:
+        return cached
+    generation = cache.catalog.generation
+
+    try:
+        halls = await crud.get_halls(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": halls.next_cursor} if halls.next_cursor else None
+    body = HallListAdapter.dump_json(HallListAdapter.validate_python(halls.items))
+    return cache.catalog.put(key, body, tags=["halls"], generation=generation, headers=headers)
 
 @router.get("/{hall_id}", response_model=schemas.Hall)
-async def read_hall(hall_id: int, db: Session = Depends(get_db)):
-    hall = crud.get_hall(db, hall_id=hall_id)
+async def read_hall(hall_id: int, db: AsyncSession = Depends(get_db)):
+    hall = await crud.get_hall(db, hall_id=hall_id)
     if hall is None:
         raise HTTPException(status_code=404, detail="Hall not found")
     return hall
@@ -25,7 +41,7 @@ async def read_hall(hall_id: int, db: Session = Depends(get_db)):
 @router.post("/", response_model=schemas.Hall)
 async def create_hall(
     hall: schemas.HallCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_role("admin"))
 ):
-    return crud.create_hall(db=db, hall=hall)
\ No newline at end of file
+    return await crud.create_hall(db=db, hall=hall)
\ No newline at end of file
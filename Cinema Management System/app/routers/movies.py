@@ -1,53 +1,103 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
+from typing import List, Literal, Optional
 from app.database import get_db
-from app import crud, schemas, models
+from app import crud, schemas, models, cache
+from app.serialization import json_response
 from app.auth import get_current_user, require_role
+from app.schedule import ScheduleConflict
 
 router = APIRouter(prefix="/api/movies", tags=["movies"])
 
+MovieAdapter = TypeAdapter(schemas.Movie)
+MovieListAdapter = TypeAdapter(List[schemas.Movie])
+
 @router.get("/", response_model=List[schemas.Movie])
 async def read_movies(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
     genre: Optional[str] = None,
     minRating: Optional[float] = Query(None, alias="minRating", ge=0, le=10),
-    db: Session = Depends(get_db)
+    minAudienceScore: Optional[float] = Query(None, alias="minAudienceScore", ge=0, le=10),
+    sort: Literal["id", "audience_score"] = "id",
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
+    key = ("movies", page, limit, genre, minRating, minAudienceScore, sort, cursor)
+    cached = cache.catalog.get(key)
+    if cached is not None:
+        return cached
+    generation = cache.catalog.generation
+
     skip = (page - 1) * limit
-    movies = crud.get_movies(
-        db, 
-        skip=skip, 
-        limit=limit,
-        genre=genre,
-        min_rating=minRating
-    )
-    return movies
+    try:
+        movies = await crud.get_movies(
+            db, 
+            skip=skip, 
+            limit=limit,
+            genre=genre,
+            min_rating=minRating,
+            cursor=cursor,
+            min_audience_score=minAudienceScore,
+            sort=sort
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": movies.next_cursor} if movies.next_cursor else None
+    body = MovieListAdapter.dump_json(MovieListAdapter.validate_python(movies.items))
+    return cache.catalog.put(key, body, tags=["movies"], generation=generation, headers=headers)
+
+@router.get("/search", response_model=List[schemas.Movie])
+async def search_movies(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    # Ранжированный поиск по названию, жанру и описанию с поиском по префиксу
+    movies = await crud.search_movies(db, q, limit=limit)
+    return json_response(MovieListAdapter, movies)
 
 @router.get("/{movie_id}", response_model=schemas.Movie)
-async def read_movie(movie_id: int, db: Session = Depends(get_db)):
-    movie = crud.get_movie(db, movie_id=movie_id)
+async def read_movie(movie_id: int, db: AsyncSession = Depends(get_db)):
+    key = ("movie", movie_id)
+    cached = cache.catalog.get(key)
+    if cached is not None:
+        return cached
+    generation = cache.catalog.generation
+
+    movie = await crud.get_movie(db, movie_id=movie_id)
     if movie is None:
         raise HTTPException(status_code=404, detail="Movie not found")
-    return movie
+    body = MovieAdapter.dump_json(MovieAdapter.validate_python(movie))
+    return cache.catalog.put(key, body, tags=[f"movie:{movie_id}"], generation=generation)
+
+@router.get("/{movie_id}/stats", response_model=schemas.MovieStats)
+async def read_movie_stats(movie_id: int, db: AsyncSession = Depends(get_db)):
+    stats = await crud.get_movie_stats(db, movie_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Movie not found")
+    return stats
 
 @router.post("/", response_model=schemas.Movie)
 async def create_movie(
     movie: schemas.MovieCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_role("admin"))
 ):
-    return crud.create_movie(db=db, movie=movie)
+    return await crud.create_movie(db=db, movie=movie)
 
 @router.put("/{movie_id}", response_model=schemas.Movie)
 async def update_movie(
     movie_id: int,
     movie_update: schemas.MovieUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_role("admin"))
 ):
-    movie = crud.update_movie(db, movie_id, movie_update)
+    try:
+        movie = await crud.update_movie(db, movie_id, movie_update)
+    except ScheduleConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if movie is None:
         raise HTTPException(status_code=404, detail="Movie not found")
     return movie
@@ -55,10 +105,10 @@ async def update_movie(
 @router.delete("/{movie_id}")
 async def delete_movie(
     movie_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_role("admin"))
 ):
-    movie = crud.delete_movie(db, movie_id)
+    movie = await crud.delete_movie(db, movie_id)
     if movie is None:
         raise HTTPException(status_code=404, detail="Movie not found")
     return {"message": "Movie deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import List, Literal, Optional
+from app.database import get_db
+from app import crud, schemas, models
+from app.auth import require_roles
+
+router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+ReportGroup = Literal["day", "session", "movie", "hall"]
+
+async def _report(db: AsyncSession, group_by: List[str], date_from: Optional[date], date_to: Optional[date], limit: int):
+    if len(set(group_by)) != len(group_by):
+        raise HTTPException(status_code=400, detail="Duplicate group_by values")
+    return await crud.get_sales_report(db, group_by, date_from=date_from, date_to=date_to, limit=limit)
+
+@router.get("/revenue", response_model=List[schemas.SalesReportRow], response_model_exclude_none=True)
+async def revenue_report(
+    group_by: List[ReportGroup] = Query(["day"]),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(require_roles(["admin"]))
+):
+    # Выручка по дням сеансов; group_by можно повторять: ?group_by=day&group_by=movie
+    return await _report(db, group_by, date_from, date_to, limit)
+
+@router.get("/occupancy", response_model=List[schemas.SalesReportRow], response_model_exclude_none=True)
+async def occupancy_report(
+    group_by: List[ReportGroup] = Query(["session"]),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(require_roles(["admin"]))
+):
+    # Заполняемость - проданные билеты к вместимости зала, по сеансам или по группам сеансов
+    return await _report(db, group_by, date_from, date_to, limit)
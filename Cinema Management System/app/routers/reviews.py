@@ -1,31 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
+from typing import List, Optional
 from app.database import get_db
 from app import crud, schemas, models
 from app.auth import get_current_user
+from app.serialization import json_response
 
 router = APIRouter(prefix="/api/reviews", tags=["reviews"])
 
+ReviewListAdapter = TypeAdapter(List[schemas.Review])
+
 @router.get("/movie/{movie_id}", response_model=List[schemas.Review])
-async def read_movie_reviews(movie_id: int, db: Session = Depends(get_db)):
-    movie = crud.get_movie(db, movie_id)
+async def read_movie_reviews(
+    movie_id: int,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    movie = await crud.get_movie(db, movie_id)
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found")
-    return crud.get_movie_reviews(db, movie_id)
+    try:
+        reviews = await crud.get_movie_reviews(db, movie_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": reviews.next_cursor} if reviews.next_cursor else None
+    return json_response(ReviewListAdapter, reviews.items, headers=headers)
 
 @router.post("/", response_model=schemas.Review)
 async def create_review(
     review: schemas.ReviewCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Проверяем существование фильма
-    movie = crud.get_movie(db, review.movie_id)
+    movie = await crud.get_movie(db, review.movie_id)
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found")
     
     try:
-        return crud.create_review(db=db, review=review, user_id=current_user.id)
+        return await crud.create_review(db=db, review=review, user_id=current_user.id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
@@ -1,52 +1,174 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
+from datetime import datetime
+from typing import List, Optional
+import csv
+import io
+import json
 from app.database import get_db
-from app import crud, schemas, models
-from app.auth import require_roles
+from app import crud, schemas, models, seats, cache, holds
+from app.schedule import ScheduleConflict
+from app.serialization import json_response
+from app.auth import get_current_user, require_roles
 
 router = APIRouter(prefix="/api/sessions", tags=["sessions"])
 
+SessionAdapter = TypeAdapter(schemas.Session)
+SessionListAdapter = TypeAdapter(List[schemas.Session])
+
 @router.get("/", response_model=List[schemas.Session])
 async def read_sessions(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    movie_id: Optional[int] = None,
+    hall_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.get_sessions(db, skip=skip, limit=limit)
+    # Сеансы отдаются по возрастанию времени начала; date_from включительно, date_to - нет
+    try:
+        sessions = await crud.get_sessions(
+            db,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+            date_from=date_from,
+            date_to=date_to,
+            movie_id=movie_id,
+            hall_id=hall_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": sessions.next_cursor} if sessions.next_cursor else None
+    return json_response(SessionListAdapter, sessions.items, headers=headers)
 
 @router.get("/{session_id}", response_model=schemas.Session)
-async def read_session(session_id: int, db: Session = Depends(get_db)):
-    session = crud.get_session(db, session_id=session_id)
+async def read_session(session_id: int, db: AsyncSession = Depends(get_db)):
+    key = ("session", session_id)
+    cached = cache.catalog.get(key)
+    if cached is not None:
+        return cached
+    generation = cache.catalog.generation
+
+    session = await crud.get_session(db, session_id=session_id)
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return session
+    # Сеанс содержит фильм и зал, поэтому сбрасывается и при их изменении
+    tags = [f"session:{session_id}", f"movie:{session.movie_id}", f"hall:{session.hall_id}"]
+    body = SessionAdapter.dump_json(SessionAdapter.validate_python(session))
+    return cache.catalog.put(key, body, tags=tags, generation=generation)
+
+@router.get("/{session_id}/seats", response_model=schemas.SeatMap)
+async def read_session_seats(session_id: int, db: AsyncSession = Depends(get_db)):
+    # Карта мест отдается из памяти, к БД обращаемся только при первом запросе
+    seat_map = seats.get_cached(session_id)
+    if seat_map is None:
+        session = await crud.get_session(db, session_id=session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        seat_map = await seats.load(db, session)
+    return seat_map.to_dict(held=holds.store.held(session_id))
+
+@router.post("/{session_id}/holds", response_model=schemas.Hold, status_code=201)
+async def create_hold(
+    session_id: int,
+    hold: schemas.HoldCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Временная бронь мест на время оформления; покупка этих мест снимает бронь
+    session = await crud.get_session(db, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        return await crud.create_hold(db, session, hold, user_id=current_user.id)
+    except holds.SeatHeld as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/{session_id}/holds/{hold_id}")
+async def delete_hold(
+    session_id: int,
+    hold_id: str,
+    current_user: models.User = Depends(get_current_user)
+):
+    hold = crud.get_hold(session_id, hold_id)
+    if hold is None:
+        raise HTTPException(status_code=404, detail="Hold not found")
+    # Зрители снимают только свои брони, кассиры и админы - любые
+    if current_user.role == "viewer" and hold.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    crud.delete_hold(hold)
+    return {"message": "Hold released successfully"}
 
 @router.post("/", response_model=schemas.Session)
 async def create_session(
     session: schemas.SessionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_roles(["admin", "cashier"]))
 ):
     # Проверяем существование фильма и зала
-    movie = crud.get_movie(db, session.movie_id)
+    movie = await crud.get_movie(db, session.movie_id)
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found")
     
-    hall = crud.get_hall(db, session.hall_id)
+    hall = await crud.get_hall(db, session.hall_id)
     if not hall:
         raise HTTPException(status_code=404, detail="Hall not found")
     
-    return crud.create_session(db=db, session=session)
+    try:
+        return await crud.create_session(db=db, session=session)
+    except ScheduleConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/bulk", response_model=schemas.SessionImportResult)
+async def import_sessions(
+    request: Request,
+    response: Response,
+    partial: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(require_roles(["admin", "cashier"]))
+):
+    # Тело - JSON-массив сеансов или CSV с заголовком movie_id,hall_id,start_time,price
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("text/csv"):
+            rows = list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+        else:
+            rows = json.loads(body)
+    except (ValueError, csv.Error):
+        raise HTTPException(status_code=400, detail="Invalid import file")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a list of sessions")
+    if len(rows) > schemas.MAX_SESSIONS_PER_IMPORT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {schemas.MAX_SESSIONS_PER_IMPORT} sessions per import"
+        )
+
+    result = await crud.import_sessions(db, rows, partial=partial)
+    if result["errors"] and not result["created"]:
+        response.status_code = 400
+    return result
 
 @router.put("/{session_id}", response_model=schemas.Session)
 async def update_session(
     session_id: int,
     session_update: schemas.SessionUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_roles(["admin", "cashier"]))
 ):
-    session = crud.update_session(db, session_id, session_update)
+    try:
+        session = await crud.update_session(db, session_id, session_update)
+    except ScheduleConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     return session
@@ -54,10 +176,10 @@ async def update_session(
 @router.delete("/{session_id}")
 async def delete_session(
     session_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_roles(["admin", "cashier"]))
 ):
-    session = crud.delete_session(db, session_id)
+    session = await crud.delete_session(db, session_id)
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"message": "Session deleted successfully"}
\ No newline at end of file
@@ -1,26 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
+from datetime import datetime
+from typing import List, Literal, Optional
 from app.database import get_db
-from app import crud, schemas, models
+from app import crud, schemas, models, export, admission
 from app.auth import get_current_user, require_roles
+from app.serialization import json_response
 
 router = APIRouter(prefix="/api/tickets", tags=["tickets"])
 
+TicketListAdapter = TypeAdapter(List[schemas.Ticket])
+
 @router.get("/my", response_model=List[schemas.Ticket])
 async def read_my_tickets(
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.get_user_tickets(db, current_user.id)
+    try:
+        tickets = await crud.get_user_tickets(db, current_user.id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": tickets.next_cursor} if tickets.next_cursor else None
+    return json_response(TicketListAdapter, tickets.items, headers=headers)
+
+@router.get("/export")
+async def export_tickets(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    session_id: Optional[int] = None,
+    current_user: models.User = Depends(require_roles(["admin"]))
+):
+    # Выгрузка билетов для сверки: строки отдаются потоком по мере чтения из БД
+    query = export.tickets_query(date_from=date_from, date_to=date_to, session_id=session_id)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export.stream_tickets(query, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tickets.{format}"'}
+    )
 
 @router.get("/{ticket_id}", response_model=schemas.Ticket)
 async def read_ticket(
     ticket_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    ticket = crud.get_ticket(db, ticket_id=ticket_id)
+    ticket = await crud.get_ticket(db, ticket_id=ticket_id)
     if ticket is None:
         raise HTTPException(status_code=404, detail="Ticket not found")
     
@@ -30,18 +60,35 @@ async def read_ticket(
     
     return ticket
 
-@router.post("/", response_model=schemas.Ticket)
+# Покупки проходят контроль допуска: в пик продаж лишние запросы ждут в очереди или получают 429/503
+@router.post("/", response_model=schemas.Ticket, dependencies=[Depends(admission.admit_purchase)])
 async def buy_ticket(
     ticket: schemas.TicketCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Проверяем существование сеанса
+    session = await crud.get_session(db, ticket.session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    try:
+        return await crud.create_ticket(db=db, ticket=ticket, user_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/batch", response_model=List[schemas.Ticket], dependencies=[Depends(admission.admit_purchase)])
+async def buy_tickets(
+    batch: schemas.TicketBatchCreate,
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Проверяем существование сеанса
-    session = crud.get_session(db, ticket.session_id)
+    session = await crud.get_session(db, batch.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     try:
-        return crud.create_ticket(db=db, ticket=ticket, user_id=current_user.id)
+        return await crud.create_tickets(db=db, batch=batch, user_id=current_user.id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
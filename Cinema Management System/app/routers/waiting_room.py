@@ -0,0 +1,14 @@
+from fastapi import APIRouter, HTTPException
+from app import schemas, admission
+import time
+
+router = APIRouter(prefix="/api/waiting-room", tags=["waiting room"])
+
+@router.get("/{token}", response_model=schemas.WaitingRoomStatus)
+async def read_waiting_room(token: str):
+    # Токен выдается в заголовке X-Waiting-Room-Token ответа 503; когда ready = true,
+    # запрос повторяется с этим заголовком и проходит без очереди
+    room_status = admission.waiting_room.status(token, time.monotonic())
+    if room_status is None:
+        raise HTTPException(status_code=404, detail="Token not found or expired")
+    return room_status
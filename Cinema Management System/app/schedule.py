@@ -0,0 +1,158 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+
+class ScheduleConflict(ValueError):
+    pass
+
+# Запись расписания сериализуется по залу до конца транзакции, иначе два запроса могут одновременно
+# не найти пересечений и оба вставить сеанс. В Postgres блокируются строки залов (SELECT ... FOR UPDATE,
+# по возрастанию id, чтобы не было взаимоблокировок). В SQLite блокировок строк нет: пустое обновление
+# залов сразу берет блокировку записи всей базы, как BEGIN IMMEDIATE, но и посреди транзакции.
+async def lock_halls(db: AsyncSession, hall_ids: Iterable[int]):
+    hall_ids = sorted(set(hall_ids))
+    if not hall_ids:
+        return
+    hall = models.Hall
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(select(hall.id).where(hall.id.in_(hall_ids)).order_by(hall.id).with_for_update())
+    else:
+        await db.execute(
+            update(hall)
+            .where(hall.id.in_(hall_ids))
+            .values(capacity=hall.capacity)
+            .execution_options(synchronize_session=False)
+        )
+
+# Проверка пересечения сеансов в зале. Сеансы зала не пересекаются, поэтому достаточно двух соседей
+# нового сеанса по индексу (hall_id, start_time): предыдущий не должен заканчиваться позже начала,
+# а следующий - начинаться раньше конца. Это два поиска по индексу вместо просмотра всего расписания зала.
+async def find_conflict(
+    db: AsyncSession,
+    hall_id: int,
+    start_time: datetime,
+    duration: int,
+    exclude_id: Optional[int] = None
+) -> Optional[int]:
+    end_time = start_time + timedelta(minutes=duration)
+    session, movie = models.Session, models.Movie
+    others = [session.hall_id == hall_id]
+    if exclude_id is not None:
+        others.append(session.id != exclude_id)
+
+    previous = (await db.execute(
+        select(session.id, session.start_time, movie.duration)
+        .join(movie, session.movie_id == movie.id)
+        .where(*others, session.start_time <= start_time)
+        .order_by(session.start_time.desc(), session.id.desc())
+        .limit(1)
+    )).first()
+    if previous is not None and previous.start_time + timedelta(minutes=previous.duration) > start_time:
+        return previous.id
+
+    following = await db.scalar(
+        select(session.id)
+        .where(*others, session.start_time > start_time, session.start_time < end_time)
+        .order_by(session.start_time, session.id)
+        .limit(1)
+    )
+    return following
+
+async def check(
+    db: AsyncSession,
+    hall_id: int,
+    start_time: datetime,
+    duration: int,
+    exclude_id: Optional[int] = None
+):
+    await lock_halls(db, [hall_id])
+    conflict_id = await find_conflict(db, hall_id, start_time, duration, exclude_id)
+    if conflict_id is not None:
+        raise ScheduleConflict(f"Hall is busy: overlaps with session {conflict_id}")
+
+# Расписание одного зала в памяти для пакетной проверки: интервалы отсортированы по началу
+# и не пересекаются, поиск соседей - бинарный
+class Timeline:
+    __slots__ = ("starts", "ends", "labels")
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        self.labels: List[str] = []
+
+    def conflict(self, start_time: datetime, end_time: datetime) -> Optional[str]:
+        i = bisect_right(self.starts, start_time)
+        if i and self.ends[i - 1] > start_time:
+            return self.labels[i - 1]
+        if i < len(self.starts) and self.starts[i] < end_time:
+            return self.labels[i]
+        return None
+
+    def add(self, start_time: datetime, end_time: datetime, label: str):
+        i = bisect_right(self.starts, start_time)
+        self.starts.insert(i, start_time)
+        self.ends.insert(i, end_time)
+        self.labels.insert(i, label)
+
+async def load_timelines(
+    db: AsyncSession,
+    hall_ids: Iterable[int],
+    start_from: datetime,
+    start_to: datetime,
+    durations: Optional[Dict[int, int]] = None
+) -> Dict[int, Timeline]:
+    # Одним запросом грузим сеансы залов, которые могут пересечься с интервалом [start_from, start_to):
+    # раньше start_from берем запас на самый длинный фильм. durations подменяет длительность фильмов
+    hall_ids = list(hall_ids)
+    durations = durations or {}
+    timelines = {hall_id: Timeline() for hall_id in hall_ids}
+    if not hall_ids:
+        return timelines
+    max_duration = max([await db.scalar(select(func.max(models.Movie.duration))) or 0, *durations.values()])
+    session, movie = models.Session, models.Movie
+    rows = await db.execute(
+        select(session.id, session.hall_id, session.start_time, session.movie_id, movie.duration)
+        .join(movie, session.movie_id == movie.id)
+        .where(
+            session.hall_id.in_(hall_ids),
+            session.start_time >= start_from - timedelta(minutes=max_duration),
+            session.start_time < start_to
+        )
+        .order_by(session.hall_id, session.start_time, session.id)
+    )
+    for row in rows:
+        timeline = timelines[row.hall_id]
+        timeline.starts.append(row.start_time)
+        timeline.ends.append(row.start_time + timedelta(minutes=durations.get(row.movie_id, row.duration)))
+        timeline.labels.append(f"session {row.id}")
+    return timelines
+
+async def check_movie(db: AsyncSession, movie_id: int, duration: int):
+    # Новая длительность фильма проверяется по всем его сеансам: сеанс с прежней длительностью
+    # мог заканчиваться вплотную к следующему в зале. Интервалы зала отсортированы по началу,
+    # поэтому любое пересечение видно на соседних сеансах
+    session = models.Session
+    halls = (await db.execute(
+        select(session.hall_id, func.min(session.start_time), func.max(session.start_time))
+        .where(session.movie_id == movie_id)
+        .group_by(session.hall_id)
+    )).all()
+    if not halls:
+        return
+    await lock_halls(db, [hall_id for hall_id, _, _ in halls])
+    timelines = await load_timelines(
+        db,
+        [hall_id for hall_id, _, _ in halls],
+        min(first for _, first, _ in halls),
+        max(last for _, _, last in halls) + timedelta(minutes=duration),
+        durations={movie_id: duration}
+    )
+    for timeline in timelines.values():
+        for i in range(1, len(timeline.starts)):
+            if timeline.ends[i - 1] > timeline.starts[i]:
+                raise ScheduleConflict(
+                    f"Hall is busy: {timeline.labels[i - 1]} would overlap with {timeline.labels[i]}"
+                )
@@ -1,8 +1,11 @@
-from pydantic import BaseModel, EmailStr, validator
-from datetime import datetime
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, EmailStr, ValidationInfo, field_validator
+from datetime import date, datetime
+from typing import Optional, List, Dict
 from enum import Enum
 
+MAX_SEATS_PER_ORDER = 10
+MAX_SESSIONS_PER_IMPORT = 20000
+
 class UserRole(str, Enum):
     VIEWER = "viewer"
     CASHIER = "cashier"
@@ -16,7 +19,8 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
     
-    @validator('password')
+    @field_validator('password')
+    @classmethod
     def validate_password(cls, v):
         if len(v) < 6:
             raise ValueError('Password must be at least 6 characters')
@@ -31,13 +35,17 @@ class User(UserBase):
     is_active: bool
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Token(BaseModel):
     access_token: str
     token_type: str
 
+class WaitingRoomStatus(BaseModel):
+    ready: bool
+    position: int
+    retry_after: int
+
 class MovieBase(BaseModel):
     title: str
     genre: str
@@ -45,13 +53,15 @@ class MovieBase(BaseModel):
     rating: float
     description: Optional[str] = None
     
-    @validator('duration')
+    @field_validator('duration')
+    @classmethod
     def validate_duration(cls, v):
         if v <= 0:
             raise ValueError('Duration must be positive')
         return v
     
-    @validator('rating')
+    @field_validator('rating')
+    @classmethod
     def validate_rating(cls, v):
         if not 0 <= v <= 10:
             raise ValueError('Rating must be between 0 and 10')
@@ -69,21 +79,40 @@ class MovieUpdate(BaseModel):
 
 class Movie(MovieBase):
     id: int
+    review_count: int = 0
+    audience_score: float = 0
     created_at: datetime
     updated_at: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+class MovieStats(BaseModel):
+    movie_id: int
+    review_count: int
+    review_sum: int
+    audience_score: float
+    histogram: Dict[int, int]  # оценка 1-10 -> количество отзывов
 
 class HallBase(BaseModel):
     name: str
     capacity: int
+    rows: int = 1
     
-    @validator('capacity')
+    @field_validator('capacity')
+    @classmethod
     def validate_capacity(cls, v):
         if v <= 0:
             raise ValueError('Capacity must be positive')
         return v
+    
+    @field_validator('rows')
+    @classmethod
+    def validate_rows(cls, v, info: ValidationInfo):
+        if v <= 0:
+            raise ValueError('Rows must be positive')
+        if 'capacity' in info.data and v > info.data['capacity']:
+            raise ValueError('Rows must not exceed capacity')
+        return v
 
 class HallCreate(HallBase):
     pass
@@ -91,8 +120,7 @@ class HallCreate(HallBase):
 class Hall(HallBase):
     id: int
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class SessionBase(BaseModel):
     movie_id: int
@@ -100,7 +128,8 @@ class SessionBase(BaseModel):
     start_time: datetime
     price: float
     
-    @validator('price')
+    @field_validator('price')
+    @classmethod
     def validate_price(cls, v):
         if v <= 0:
             raise ValueError('Price must be positive')
@@ -121,8 +150,16 @@ class Session(SessionBase):
     movie: Movie
     hall: Hall
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+class SessionImportError(BaseModel):
+    row: int
+    error: str
+
+class SessionImportResult(BaseModel):
+    created: int
+    ids: List[int]
+    errors: List[SessionImportError]
 
 class TicketBase(BaseModel):
     session_id: int
@@ -131,21 +168,76 @@ class TicketBase(BaseModel):
 class TicketCreate(TicketBase):
     pass
 
+class TicketBatchCreate(BaseModel):
+    session_id: int
+    seat_numbers: List[str]
+    
+    @field_validator('seat_numbers')
+    @classmethod
+    def validate_seat_numbers(cls, v):
+        if not 1 <= len(v) <= MAX_SEATS_PER_ORDER:
+            raise ValueError(f'From 1 to {MAX_SEATS_PER_ORDER} seats per order')
+        return v
+
 class Ticket(TicketBase):
     id: int
     user_id: int
+    price: float
     purchased_at: datetime
     session: Session
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+class HoldCreate(BaseModel):
+    seat_numbers: List[str]
+
+    @field_validator('seat_numbers')
+    @classmethod
+    def validate_seat_numbers(cls, v):
+        if not 1 <= len(v) <= MAX_SEATS_PER_ORDER:
+            raise ValueError(f'From 1 to {MAX_SEATS_PER_ORDER} seats per order')
+        return v
+
+class Hold(BaseModel):
+    id: str
+    session_id: int
+    seat_numbers: List[str]
+    expires_at: datetime
+
+class SeatRow(BaseModel):
+    row: str
+    seats: str  # по символу на место: "0" - свободно, "1" - занято, "2" - забронировано
+
+class SeatMap(BaseModel):
+    session_id: int
+    hall_id: int
+    capacity: int
+    seats_per_row: int
+    taken: int
+    held: int = 0
+    available: int
+    rows: List[SeatRow]
+
+class SalesReportRow(BaseModel):
+    day: Optional[date] = None
+    session_id: Optional[int] = None
+    movie_id: Optional[int] = None
+    movie_title: Optional[str] = None
+    hall_id: Optional[int] = None
+    hall_name: Optional[str] = None
+    sessions: int
+    tickets_sold: int
+    capacity: int
+    revenue: float
+    occupancy: float
 
 class ReviewBase(BaseModel):
     movie_id: int
     rating: int
     comment: Optional[str] = None
     
-    @validator('rating')
+    @field_validator('rating')
+    @classmethod
     def validate_rating(cls, v):
         if not 1 <= v <= 10:
             raise ValueError('Rating must be between 1 and 10')
@@ -160,5 +252,4 @@ class Review(ReviewBase):
     created_at: datetime
     user: User
     
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
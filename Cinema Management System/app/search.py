@@ -0,0 +1,74 @@
+from typing import List, Optional
+from sqlalchemy import case, or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Полнотекстовый индекс фильмов: SQLite FTS5 по title, genre и description, rowid = movies.id.
+# Индекс читает строки из movies (external content) и обновляется триггерами на movies (миграция 0004).
+# Если индекса нет (другая БД или SQLite без FTS5), поиск идет через LIKE.
+FTS_TABLE = "movies_fts"
+# Вес колонок в bm25: совпадение в названии важнее, чем в описании
+FTS_WEIGHTS = "10.0, 3.0, 1.0"
+
+fts_enabled = False
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def setup(connection: Connection):
+    # Таблица и триггеры создаются миграциями; при старте только проверяем, есть ли она
+    global fts_enabled
+    fts_enabled = connection.dialect.name == "sqlite" and connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first() is not None
+    if connection.dialect.name == "sqlite" and not fts_enabled:
+        logger.warning("Full-text index is missing, falling back to LIKE search")
+
+def match_query(q: str, column: Optional[str] = None) -> Optional[str]:
+    # Каждое слово ищется как префикс: "дюн вил" -> "дюн"* AND "вил"*
+    tokens = TOKEN_RE.findall(q)
+    if not tokens:
+        return None
+    terms = " ".join(f'"{token}"*' for token in tokens)
+    return f"{column} : ({terms})" if column else terms
+
+def rebuild(connection: Connection):
+    # Полная переиндексация по таблице movies, например после восстановления базы из копии
+    if fts_enabled:
+        connection.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"))
+
+async def search_movies(db: AsyncSession, q: str, limit: int = 20) -> List[models.Movie]:
+    match = match_query(q)
+    if match is None:
+        return []
+
+    if fts_enabled:
+        ids = (await db.execute(
+            text(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+                f"ORDER BY bm25({FTS_TABLE}, {FTS_WEIGHTS}) LIMIT :limit"
+            ),
+            {"match": match, "limit": limit},
+        )).scalars().all()
+        if not ids:
+            return []
+        movies = {movie.id: movie for movie in await db.scalars(select(models.Movie).where(models.Movie.id.in_(ids)))}
+        return [movies[movie_id] for movie_id in ids if movie_id in movies]
+
+    # Запасной вариант без индекса: все слова должны встретиться, совпадения в названии выше
+    tokens = TOKEN_RE.findall(q)
+    conditions = [
+        or_(
+            models.Movie.title.ilike(f"%{token}%"),
+            models.Movie.genre.ilike(f"%{token}%"),
+            models.Movie.description.ilike(f"%{token}%"),
+        )
+        for token in tokens
+    ]
+    title_match = case((models.Movie.title.ilike(f"%{tokens[0]}%"), 0), else_=1)
+    query = select(models.Movie).where(*conditions).order_by(title_match, models.Movie.id).limit(limit)
+    return (await db.scalars(query)).all()
@@ -0,0 +1,194 @@
+from collections import OrderedDict
+from typing import Collection, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+import logging
+import os
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+SEAT_MAP_CACHE_SIZE = int(os.getenv("SEAT_MAP_CACHE_SIZE", "10000"))
+# Сколько секунд карта отдается из памяти без сверки с БД: билеты продают и другие воркеры
+SEAT_MAP_TTL = float(os.getenv("SEAT_MAP_TTL", "2"))
+
+SEAT_LABEL_RE = re.compile(r"^([A-Z]+)(\d+)$")
+
+def row_label(row: int) -> str:
+    # 0 -> A, 25 -> Z, 26 -> AA
+    label = ""
+    row += 1
+    while row:
+        row, rem = divmod(row - 1, 26)
+        label = chr(ord("A") + rem) + label
+    return label
+
+def row_index(label: str) -> int:
+    row = 0
+    for char in label:
+        row = row * 26 + ord(char) - ord("A") + 1
+    return row - 1
+
+# Схема зала: ряды A, B, ... и места 1..seats_per_row,
+# номер места "A1" отображается в плотный индекс row * seats_per_row + seat
+class SeatLayout:
+    __slots__ = ("capacity", "rows", "seats_per_row")
+
+    def __init__(self, capacity: int, rows: int = 1):
+        self.capacity = capacity
+        self.rows = rows
+        self.seats_per_row = -(-capacity // rows)
+
+    @classmethod
+    def for_hall(cls, hall: models.Hall) -> "SeatLayout":
+        return cls(hall.capacity, hall.rows or 1)
+
+    def index(self, seat_number: str) -> int:
+        match = SEAT_LABEL_RE.match(seat_number.strip().upper())
+        if not match:
+            raise ValueError("Invalid seat number")
+        row, seat = row_index(match.group(1)), int(match.group(2)) - 1
+        index = row * self.seats_per_row + seat
+        if row >= self.rows or not 0 <= seat < self.seats_per_row or index >= self.capacity:
+            raise ValueError("Invalid seat number")
+        return index
+
+    def label(self, index: int) -> str:
+        row, seat = divmod(index, self.seats_per_row)
+        return f"{row_label(row)}{seat + 1}"
+
+# Занятость мест сеанса в виде битовой карты: capacity / 8 байт на сеанс
+class SeatMap:
+    __slots__ = ("session_id", "hall_id", "layout", "bits", "taken", "checked_at")
+
+    def __init__(self, session_id: int, hall_id: int, layout: SeatLayout):
+        self.session_id = session_id
+        self.hall_id = hall_id
+        self.layout = layout
+        self.bits = bytearray((layout.capacity + 7) // 8)
+        self.taken = 0
+        self.checked_at = time.monotonic()
+
+    def fresh(self, now: float) -> bool:
+        return now - self.checked_at < SEAT_MAP_TTL
+
+    def is_taken(self, index: int) -> bool:
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def take(self, index: int):
+        if not self.is_taken(index):
+            self.bits[index >> 3] |= 1 << (index & 7)
+            self.taken += 1
+
+    def release(self, index: int):
+        if self.is_taken(index):
+            self.bits[index >> 3] &= ~(1 << (index & 7))
+            self.taken -= 1
+
+    def rows(self, held: Collection[int] = ()) -> List[dict]:
+        layout = self.layout
+        result = []
+        for row in range(layout.rows):
+            start = row * layout.seats_per_row
+            end = min(start + layout.seats_per_row, layout.capacity)
+            if start >= end:
+                break
+            seats = "".join(
+                "1" if self.is_taken(i) else "2" if i in held else "0" for i in range(start, end)
+            )
+            result.append({"row": row_label(row), "seats": seats})
+        return result
+
+    def to_dict(self, held: Collection[int] = ()) -> dict:
+        # held - индексы мест под временной бронью; проданное место бронью не считается
+        held = {index for index in held if not self.is_taken(index)}
+        return {
+            "session_id": self.session_id,
+            "hall_id": self.hall_id,
+            "capacity": self.layout.capacity,
+            "seats_per_row": self.layout.seats_per_row,
+            "taken": self.taken,
+            "held": len(held),
+            "available": self.layout.capacity - self.taken - len(held),
+            "rows": self.rows(held),
+        }
+
+# Карты мест загруженных сеансов (LRU), вытесненные строятся заново из БД.
+# Карта старше SEAT_MAP_TTL сверяется с числом проданных билетов в session_sales (один запрос
+# по ключу) и перестраивается, только если другой воркер успел продать места
+_seat_maps: "OrderedDict[int, SeatMap]" = OrderedDict()
+# Сеансы, карта которых сейчас строится: число загрузок и счетчик записей за это время.
+# Карта, во время построения которой была запись, не кэшируется; после последней загрузки
+# сеанс удаляется из обоих словарей, поэтому их размер - число одновременных загрузок
+_loading: Dict[int, int] = {}
+_versions: Dict[int, int] = {}
+stats = {"hits": 0, "misses": 0, "revalidated": 0}
+
+def get_cached(session_id: int) -> Optional[SeatMap]:
+    # Только карта, сверенная с БД не раньше SEAT_MAP_TTL назад
+    seat_map = _seat_maps.get(session_id)
+    if seat_map is not None and seat_map.fresh(time.monotonic()):
+        stats["hits"] += 1
+        _seat_maps.move_to_end(session_id)
+        return seat_map
+    stats["misses"] += 1
+    return None
+
+async def load(db: AsyncSession, session: models.Session) -> SeatMap:
+    seat_map = get_cached(session.id)
+    if seat_map is not None:
+        return seat_map
+
+    _loading[session.id] = _loading.get(session.id, 0) + 1
+    version = _versions.setdefault(session.id, 0)
+    try:
+        return await _load(db, session, version)
+    finally:
+        _loading[session.id] -= 1
+        if not _loading[session.id]:
+            del _loading[session.id]
+            del _versions[session.id]
+
+async def _load(db: AsyncSession, session: models.Session, version: int) -> SeatMap:
+    seat_map = _seat_maps.get(session.id)
+    if seat_map is not None:
+        tickets_sold = await db.scalar(
+            select(models.SessionSales.tickets_sold).where(models.SessionSales.session_id == session.id)
+        )
+        if tickets_sold == seat_map.taken and _versions[session.id] == version:
+            stats["revalidated"] += 1
+            seat_map.checked_at = time.monotonic()
+            _seat_maps.move_to_end(session.id)
+            return seat_map
+
+    seat_map = SeatMap(session.id, session.hall_id, SeatLayout.for_hall(session.hall))
+    seat_numbers = await db.scalars(
+        select(models.Ticket.seat_number).where(models.Ticket.session_id == session.id)
+    )
+    for seat_number in seat_numbers:
+        try:
+            seat_map.take(seat_map.layout.index(seat_number))
+        except ValueError:
+            logger.warning(f"Seat {seat_number} does not fit hall layout, session {session.id}")
+
+    if _versions[session.id] == version:
+        _seat_maps[session.id] = seat_map
+        if len(_seat_maps) > SEAT_MAP_CACHE_SIZE:
+            _seat_maps.popitem(last=False)
+    return seat_map
+
+def _written(session_id: int):
+    if session_id in _versions:
+        _versions[session_id] += 1
+
+def mark_taken(session_id: int, index: int):
+    _written(session_id)
+    seat_map = _seat_maps.get(session_id)
+    if seat_map is not None:
+        seat_map.take(index)
+
+def invalidate(session_id: int):
+    _written(session_id)
+    _seat_maps.pop(session_id, None)
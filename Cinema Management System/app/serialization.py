@@ -0,0 +1,21 @@
+from typing import Any, Dict, Optional
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Класс ответа по умолчанию: orjson кодирует заметно быстрее json из стандартной библиотеки,
+# но это необязательная зависимость
+DefaultResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+def json_response(adapter: TypeAdapter, data: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    # Быстрый путь для списков: ORM-объекты проверяются схемой и сразу кодируются в JSON силами pydantic-core,
+    # без промежуточных dict и повторного кодирования
+    return Response(
+        content=adapter.dump_json(adapter.validate_python(data)),
+        media_type="application/json",
+        headers=headers
+    )
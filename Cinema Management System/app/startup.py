@@ -0,0 +1,67 @@
+import time
+
+# Импортируется первым в app.main: отсюда отсчитывается время старта
+IMPORT_STARTED = time.perf_counter()
+
+from contextlib import AsyncExitStack
+from typing import Dict, Optional
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import configure_mappers
+from app.database import AsyncSessionLocal, async_engine
+from app import search
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Сколько соединений открыть заранее (не больше размера пула)
+POOL_WARMUP = int(os.getenv("POOL_WARMUP", "4"))
+
+timings: Dict[str, float] = {}
+_lifespan_done: Optional[float] = None
+
+def imported():
+    timings["import"] = time.perf_counter() - IMPORT_STARTED
+
+async def warm_pool():
+    # Пул с очередью наполняется одновременно открытыми соединениями; NullPool (SQLite) не хранит соединений
+    pool = async_engine.pool
+    count = min(POOL_WARMUP, pool.size()) if hasattr(pool, "size") else 1
+    async with AsyncExitStack() as stack:
+        connections = [await stack.enter_async_context(async_engine.connect()) for _ in range(max(count, 1))]
+        await connections[0].run_sync(search.setup)
+
+async def warm_caches():
+    # Первые страницы каталога собираются теми же обработчиками, что и запросы, с теми же ключами кэша
+    from app.routers import halls, movies
+    async with AsyncSessionLocal() as db:
+        await movies.read_movies(
+            page=1, limit=10, genre=None, minRating=None, minAudienceScore=None, sort="id", cursor=None, db=db
+        )
+        await halls.read_halls(skip=0, limit=100, cursor=None, db=db)
+
+async def run():
+    global _lifespan_done
+    started = time.perf_counter()
+    # Связи моделей настраиваются сейчас, а не на первом запросе
+    configure_mappers()
+    await warm_pool()
+    try:
+        await warm_caches()
+    except SQLAlchemyError as e:
+        logger.warning(f"Cache warm-up skipped, is the database migrated? {e}")
+    _lifespan_done = time.perf_counter()
+    timings["lifespan"] = _lifespan_done - started
+    logger.info(
+        f"Startup: import {timings['import'] * 1000:.0f}ms, lifespan {timings['lifespan'] * 1000:.0f}ms"
+    )
+
+def first_request_done():
+    if "first_request" in timings or _lifespan_done is None:
+        return
+    timings["first_request"] = time.perf_counter() - _lifespan_done
+    timings["to_first_request"] = time.perf_counter() - IMPORT_STARTED
+    logger.info(
+        f"First request served {timings['first_request'] * 1000:.0f}ms after startup, "
+        f"{timings['to_first_request'] * 1000:.0f}ms after import"
+    )
@@ -0,0 +1,105 @@
+# Шторм входов: N одновременных POST /auth/login и параллельный "пробник" GET /health.
+# Задержка пробника показывает, блокирует ли хеширование паролей event loop.
+#
+#   python -m benchmarks.login_storm --logins 200 --workers 4 --rounds 12
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def summary(latencies):
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2),
+    }
+
+async def run(args):
+    import httpx
+    from sqlalchemy import insert
+    from app import models
+    from app.auth import get_password_hash
+    from app.database import engine
+    from app.main import app
+
+    # Пользователи вставляются напрямую с одним заранее посчитанным хешем
+    hashed_password = get_password_hash("password123")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"username": f"user{i}", "email": f"user{i}@bench.local", "hashed_password": hashed_password, "role": "viewer"}
+            for i in range(args.users)
+        ])
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login_latencies, probe_latencies = [], []
+        done = asyncio.Event()
+
+        async def login(i):
+            start = time.perf_counter()
+            response = await client.post("/auth/login", data={"username": f"user{i % args.users}", "password": "password123"})
+            login_latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/health")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    return {
+        "logins": args.logins,
+        "bcrypt_rounds": args.rounds,
+        "hash_workers": args.workers,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(args.logins / elapsed, 1),
+        "login": summary(login_latencies),
+        "health_probe": summary(probe_latencies),
+        "health_probe_mean_ms": round(statistics.mean(probe_latencies) * 1000, 2) if probe_latencies else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Login storm benchmark")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--rounds", type=int, default=12, help="BCRYPT_ROUNDS")
+    args = parser.parse_args()
+
+    # Настройки читаются при импорте приложения, поэтому задаются до него
+    workdir = tempfile.mkdtemp(prefix="cinema-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    # Меряется хеширование паролей, а не контроль допуска: все входы пропускаются
+    os.environ["ADMISSION_LOGIN_RATE"] = "0"
+    os.environ["ADMISSION_LOGIN_USER_RATE"] = "0"
+    logging.disable(logging.INFO)
+
+    json.dump(asyncio.run(run(args)), sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
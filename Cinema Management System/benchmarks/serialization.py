@@ -0,0 +1,123 @@
+# Сериализация страницы из 100 сеансов с вложенными фильмом и залом.
+# Сравнивает путь FastAPI по умолчанию (проверка схемой -> dict -> json.dumps) с тем же путем на orjson
+# и с быстрым путем app.serialization.json_response (проверка схемой -> байты JSON в pydantic-core),
+# затем меряет GET /api/sessions?limit=100 целиком через приложение.
+#
+#   python -m benchmarks.serialization --rows 100 --iterations 2000
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.login_storm import summary
+
+def make_sessions(rows):
+    from app import models
+
+    now = datetime(2030, 1, 1, 10, 0)
+    halls = [models.Hall(id=i, name=f"Hall {i}", capacity=120, rows=10) for i in range(1, 6)]
+    movies = [
+        models.Movie(
+            id=i, title=f"Movie {i}", genre="drama", duration=120, rating=7.5,
+            description="Описание фильма " * 10, review_count=10, audience_score=8.1, created_at=now
+        )
+        for i in range(1, 21)
+    ]
+    return [
+        models.Session(
+            id=i, movie_id=movies[i % 20].id, hall_id=halls[i % 5].id, movie=movies[i % 20], hall=halls[i % 5],
+            start_time=now + timedelta(hours=i), price=350.0, created_at=now
+        )
+        for i in range(rows)
+    ]
+
+def measure(encode, iterations):
+    encode()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode()
+    elapsed = time.perf_counter() - start
+    return {"pages_per_s": round(iterations / elapsed, 1), "us_per_page": round(elapsed / iterations * 1e6, 1)}
+
+def encoders(rows):
+    from typing import List
+    from pydantic import TypeAdapter
+    from app import schemas
+    from app.serialization import json_response, orjson
+
+    adapter = TypeAdapter(List[schemas.Session])
+
+    # Как FastAPI с response_model: проверка, dump в jsonable dict, затем кодирование ответа
+    def default():
+        content = adapter.dump_python(adapter.validate_python(rows), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+    result = {"fastapi_json": default, "fast_path": lambda: json_response(adapter, rows).body}
+    if orjson is not None:
+        result["fastapi_orjson"] = lambda: orjson.dumps(adapter.dump_python(adapter.validate_python(rows), mode="json"))
+    return result
+
+async def run_http(args):
+    import httpx
+    from sqlalchemy import insert
+    from app import models
+    from app.database import engine
+    from app.main import app
+
+    models.Base.metadata.create_all(bind=engine)
+    sessions = make_sessions(args.rows)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Hall), [{"id": s.hall.id, "name": s.hall.name, "capacity": 120, "rows": 10} for s in sessions[:5]])
+        conn.execute(insert(models.Movie), [
+            {"id": s.movie.id, "title": s.movie.title, "genre": "drama", "duration": 120, "rating": 7.5,
+             "description": s.movie.description}
+            for s in sessions[:20]
+        ])
+        conn.execute(insert(models.Session), [
+            {"id": s.id + 1, "movie_id": s.movie_id, "hall_id": s.hall_id, "start_time": s.start_time, "price": s.price}
+            for s in sessions
+        ])
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            request_start = time.perf_counter()
+            response = await client.get("/api/sessions/", params={"limit": args.rows})
+            latencies.append(time.perf_counter() - request_start)
+            assert response.status_code == 200 and len(response.json()) == args.rows, response.text
+        elapsed = time.perf_counter() - start
+    return {"requests": args.requests, "requests_per_s": round(args.requests / elapsed, 1), "latency": summary(latencies)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization benchmark")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=500, help="GET /api/sessions requests, 0 to skip")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cinema-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    os.environ["ACCESS_LOG_SAMPLE_RATE"] = "0"
+    logging.disable(logging.WARNING)
+
+    rows = make_sessions(args.rows)
+    result = {
+        "rows": args.rows,
+        "iterations": args.iterations,
+        "encode": {name: measure(encode, args.iterations) for name, encode in encoders(rows).items()},
+    }
+    if args.requests:
+        result["http"] = asyncio.run(run_http(args))
+
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Время старта воркера: импорт по модулям (python -X importtime), lifespan и первый запрос.
+# Каждый замер - новый процесс на заранее смигрированной временной базе.
+#
+#   python -m benchmarks.startup --runs 5
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+def child():
+    # Запускается в отдельном процессе: импорт приложения, lifespan и первый запрос
+    from app.main import app
+    from app import startup
+    import httpx
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                response = await client.get("/api/sessions/", params={"limit": 10})
+                assert response.status_code == 200, response.text
+        return startup.timings
+
+    json.dump(asyncio.run(run()), sys.stdout)
+
+def import_times(env, top):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    app_modules, packages = {}, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        ms = int(cumulative) / 1000
+        if name.startswith("app.") or name == "app":
+            app_modules[name] = ms
+        elif "." not in name:
+            packages[name] = max(ms, packages.get(name, 0))
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "app_modules_ms": {name: round(ms, 1) for name, ms in app_modules.items()},
+        "slowest_packages_ms": {name: round(ms, 1) for name, ms in slowest},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest third-party packages to show")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    workdir = tempfile.mkdtemp(prefix="cinema-bench-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite+aiosqlite:///{workdir}/bench.db",
+        LOG_LEVEL="WARNING",
+        PYTHONPATH=str(BASE_DIR),
+    )
+    subprocess.run([sys.executable, "manage.py", "migrate"], cwd=BASE_DIR, env=env, capture_output=True, check=True)
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output))
+
+    result = {
+        "runs": args.runs,
+        "median_ms": {
+            phase: round(statistics.median(run[phase] for run in runs) * 1000, 1)
+            for phase in runs[0]
+        },
+        "imports": import_times(env, args.top),
+    }
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
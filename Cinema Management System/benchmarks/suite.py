@@ -0,0 +1,286 @@
+# Набор нагрузочных сценариев: приложение запускается в процессе (ASGI или локальный uvicorn)
+# на сгенерированной базе, по каждому сценарию - пропускная способность и задержки p50/p95/p99.
+# Результат - JSON; с --baseline он сравнивается с сохраненным прогоном, регрессии дают код выхода 1.
+#
+#   python -m benchmarks.suite --output results.json
+#   python -m benchmarks.suite --baseline results.json --threshold 10
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.login_storm import summary
+
+# Данные генерируются seed.py с фиксированной датой, чтобы прогоны можно было сравнивать
+START_DATE = "2030-01-01"
+
+def build_dataset(args):
+    import seed
+
+    seed.generate(seed.parse_args([
+        "--users", str(args.users),
+        "--movies", str(args.movies),
+        "--sessions", str(args.sessions),
+        "--tickets", str(args.tickets),
+        "--reviews", str(args.reviews),
+        "--seed", str(args.seed),
+        "--start-date", START_DATE,
+    ]))
+
+async def run_scenario(name, request, requests, concurrency, expected=(200,)):
+    # concurrency воркеров забирают запросы из общего счетчика
+    latencies, statuses = [], {}
+    counter = iter(range(requests))
+
+    async def worker(number):
+        for i in counter:
+            start = time.perf_counter()
+            status_code = await request(i, number)
+            latencies.append(time.perf_counter() - start)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "errors": sum(count for status_code, count in statuses.items() if status_code not in expected),
+        "status": {str(status_code): count for status_code, count in sorted(statuses.items())},
+        "latency": summary(latencies),
+    }
+
+def scenarios(client, args):
+    from sqlalchemy import func, select
+    from app import models, seats
+    from seed import DEMO_USERS, GENRES, SYNTHETIC_PASSWORD
+    from app.auth import create_access_token
+    from app.database import engine
+
+    rng = random.Random(args.seed)
+    with engine.connect() as conn:
+        movie_count = conn.scalar(select(func.count()).select_from(models.Movie))
+        # Сгенерированные пользователи user1..userN идут после демо-пользователей
+        user_count = conn.scalar(select(func.count()).select_from(models.User)) - len(DEMO_USERS)
+        first_day, last_day = conn.execute(
+            select(func.min(models.Session.start_time), func.max(models.Session.start_time))
+        ).one()
+        session_ids = conn.scalars(select(models.Session.id).order_by(models.Session.id)).all()
+        # Продажа открывается на пустой сеанс: места разбирают конкурирующие покупатели
+        hot = conn.execute(
+            select(models.Session.id, models.Hall.capacity, models.Hall.rows)
+            .join(models.Hall)
+            .where(~select(models.Ticket.id).where(models.Ticket.session_id == models.Session.id).exists())
+            .order_by(models.Session.movie_id, models.Session.id)
+            .limit(1)
+        ).one()
+    if isinstance(first_day, str):
+        first_day, last_day = datetime.fromisoformat(first_day), datetime.fromisoformat(last_day)
+    days = (last_day.date() - first_day.date()).days + 1
+    popular = range(1, min(movie_count, 20) + 1)
+    layout = seats.SeatLayout(hot.capacity, hot.rows or 1)
+    hot_seats = [layout.label(index) for index in range(min(args.hot_seats, hot.capacity))]
+    tokens = [
+        {"Authorization": f"Bearer {create_access_token({'sub': f'user{i}'})}"}
+        for i in range(1, min(user_count, args.concurrency) + 1)
+    ]
+
+    async def catalog(i, worker):
+        params = {"page": rng.randint(1, 5), "limit": 20}
+        if rng.random() < 0.5:
+            params["genre"] = rng.choice(GENRES)
+        if rng.random() < 0.3:
+            params["minRating"] = rng.choice([6, 7, 8])
+        return (await client.get("/api/movies/", params=params)).status_code
+
+    async def showtimes(i, worker):
+        day = datetime.combine(first_day.date(), datetime.min.time()) + timedelta(days=rng.randrange(days))
+        params = {"date_from": day.isoformat(), "date_to": (day + timedelta(days=1)).isoformat(), "limit": 50}
+        if rng.random() < 0.5:
+            params["movie_id"] = rng.choice(popular)
+        return (await client.get("/api/sessions/", params=params)).status_code
+
+    async def seat_map(i, worker):
+        return (await client.get(f"/api/sessions/{rng.choice(session_ids)}/seats")).status_code
+
+    async def purchase(i, worker):
+        response = await client.post(
+            "/api/tickets/",
+            json={"session_id": hot.id, "seat_number": rng.choice(hot_seats)},
+            headers=tokens[worker % len(tokens)],
+        )
+        return response.status_code
+
+    async def login(i, worker):
+        data = {"username": f"user{rng.randint(1, user_count)}", "password": SYNTHETIC_PASSWORD}
+        return (await client.post("/auth/login", data=data)).status_code
+
+    async def reviews(i, worker):
+        return (await client.get(f"/api/reviews/movie/{rng.choice(popular)}", params={"limit": 50})).status_code
+
+    # Проданное место отвечает 400: это ожидаемый исход конкурентной покупки
+    return {
+        "catalog": (catalog, args.requests, (200,)),
+        "showtimes": (showtimes, args.requests, (200,)),
+        "seat_map": (seat_map, args.requests, (200,)),
+        "purchase": (purchase, args.purchases, (200, 400)),
+        "login": (login, args.logins, (200,)),
+        "reviews": (reviews, args.requests, (200,)),
+    }
+
+def compare(result, baseline, threshold):
+    # Регрессия - рост p95/p99 или падение пропускной способности больше чем на threshold процентов
+    comparison = {}
+    for name, current in result["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        metrics = {"throughput_rps": (previous["throughput_rps"], current["throughput_rps"])}
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            metrics[key] = (previous["latency"][key], current["latency"][key])
+        entry = {}
+        regressions = []
+        for key, (before, after) in metrics.items():
+            change = round((after - before) / before * 100, 1) if before else 0.0
+            entry[key] = {"baseline": before, "current": after, "change_pct": change}
+            worse = -change if key == "throughput_rps" else change
+            if key != "p50_ms" and worse > threshold:
+                regressions.append(key)
+        entry["regressions"] = regressions
+        comparison[name] = entry
+    return comparison
+
+def mismatched(result, baseline):
+    # Прогоны с разным сервером, базой или конкурентностью сравнивать нельзя
+    return [
+        key for key in ("server", "concurrency", "seed", "database")
+        if baseline.get("meta", {}).get(key) != result["meta"][key]
+    ]
+
+async def serve(args):
+    import httpx
+    from app.main import app
+
+    if args.server == "asgi":
+        # httpx не запускает lifespan, поэтому он запускается вручную, как при старте воркера
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                return await run(client, args)
+
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            return await run(client, args)
+    finally:
+        server.should_exit = True
+        await task
+
+async def run(client, args):
+    selected = scenarios(client, args)
+    names = args.scenario or list(selected)
+    results = {}
+    for name in names:
+        request, requests, expected = selected[name]
+        if requests:
+            results[name] = await run_scenario(name, request, requests, args.concurrency, expected)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and latency benchmark suite")
+    parser.add_argument("--scenario", action="append", choices=["catalog", "showtimes", "seat_map", "purchase", "login", "reviews"])
+    parser.add_argument("--server", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per read scenario")
+    parser.add_argument("--purchases", type=int, default=500)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--hot-seats", type=int, default=50, help="seats contended by buyers")
+    parser.add_argument("--database-url", help="existing database; generated into a temp dir by default")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--movies", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=3000)
+    parser.add_argument("--tickets", type=int, default=100000)
+    parser.add_argument("--reviews", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=10, help="BCRYPT_ROUNDS")
+    parser.add_argument("--admission", action="store_true", help="keep admission control enabled")
+    parser.add_argument("--output", help="write results JSON to this file")
+    parser.add_argument("--baseline", help="compare with results JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold, percent")
+    parser.add_argument("--allow-mismatch", action="store_true", help="compare with a baseline from a different setup")
+    args = parser.parse_args()
+
+    # Настройки читаются при импорте приложения, поэтому задаются до него
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix="cinema-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["ACCESS_LOG_SAMPLE_RATE"] = "0"
+    if not args.admission:
+        for name in ("PURCHASE", "LOGIN"):
+            os.environ[f"ADMISSION_{name}_RATE"] = "0"
+            os.environ[f"ADMISSION_{name}_USER_RATE"] = "0"
+    logging.disable(logging.WARNING)
+
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "server": args.server,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+    }
+    # Несопоставимый baseline проверяется до прогона: сравнение с ним ничего не говорит о регрессиях
+    baseline, mismatch = None, []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        mismatch = mismatched({"meta": meta}, baseline)
+        if mismatch:
+            print(f"Baseline was recorded with different {', '.join(mismatch)}", file=sys.stderr)
+            if not args.allow_mismatch:
+                sys.exit(2)
+
+    from manage import migrate
+
+    migrate()
+    build_dataset(args)
+
+    result = {"meta": meta, "scenarios": asyncio.run(serve(args))}
+    regressions = False
+    if baseline is not None:
+        result["comparison"] = compare(result, baseline, args.threshold)
+        result["baseline_mismatch"] = mismatch
+        regressions = any(entry["regressions"] for entry in result["comparison"].values())
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
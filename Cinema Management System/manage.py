@@ -0,0 +1,59 @@
+from pathlib import Path
+from sqlalchemy import inspect
+from app.database import AsyncSessionLocal, engine
+from app import crud, search
+import argparse
+import asyncio
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+
+def migrate():
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(BASE_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BASE_DIR / "migrations"))
+    config.attributes["configure_logger"] = False
+    # База, созданная старой версией через create_all, считается уже на первой миграции
+    tables = inspect(engine).get_table_names()
+    if "movies" in tables and "alembic_version" not in tables:
+        logger.info("Existing schema without migrations, stamping revision 0001")
+        command.stamp(config, "0001")
+    command.upgrade(config, "head")
+
+async def rebuild_review_stats():
+    async with AsyncSessionLocal() as db:
+        await crud.rebuild_review_stats(db)
+
+async def rebuild_sales():
+    async with AsyncSessionLocal() as db:
+        await crud.rebuild_sales(db)
+
+def rebuild_search():
+    with engine.begin() as connection:
+        search.setup(connection)
+        search.rebuild(connection)
+
+COMMANDS = {
+    "migrate": (migrate, "применить миграции схемы БД"),
+    "rebuild-review-stats": (rebuild_review_stats, "пересчитать агрегаты отзывов фильмов"),
+    "rebuild-sales": (rebuild_sales, "пересчитать продажи по сеансам для отчетов"),
+    "rebuild-search": (rebuild_search, "перестроить полнотекстовый индекс фильмов"),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Служебные команды Cinema Management System")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+    args = parser.parse_args()
+    result = COMMANDS[args.command][0]()
+    if asyncio.iscoroutine(result):
+        asyncio.run(result)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+from logging.config import fileConfig
+from alembic import context
+from app.database import engine
+from app import models
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Таблицы FTS5 (movies_fts и служебные movies_fts_*) создаются вручную и не описаны в моделях
+    return not (type_ == "table" and name.startswith("movies_fts"))
+
+def run_migrations_offline():
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+        include_object=include_object,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    # SQLite не умеет ALTER COLUMN, поэтому изменения таблиц идут через batch-режим
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=True,
+            include_object=include_object
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
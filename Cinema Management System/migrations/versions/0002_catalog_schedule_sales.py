@@ -0,0 +1,156 @@
+"""seat rows, review aggregates, sales rollup, schedule indexes, full-text search
+
+Все изменения схемы после первой версии. База, созданная create_all одной из
+промежуточных версий, может уже содержать часть из них, поэтому каждый шаг
+проверяет текущую схему.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 16:20:41
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+movies = sa.table('movies', sa.column('id'), sa.column('review_count'), sa.column('review_sum'), sa.column('audience_score'))
+reviews = sa.table('reviews', sa.column('movie_id'), sa.column('rating'))
+review_histogram = sa.table('review_histogram', sa.column('movie_id'), sa.column('rating'), sa.column('count'))
+halls = sa.table('halls', sa.column('id'), sa.column('capacity'))
+sessions = sa.table('sessions', sa.column('id'), sa.column('movie_id'), sa.column('hall_id'), sa.column('start_time'), sa.column('price'))
+tickets = sa.table('tickets', sa.column('id'), sa.column('session_id'), sa.column('seat_number'))
+session_sales = sa.table(
+    'session_sales', sa.column('session_id'), sa.column('movie_id'), sa.column('hall_id'), sa.column('day'),
+    sa.column('capacity'), sa.column('tickets_sold'), sa.column('revenue')
+)
+
+def create_index(inspector, name, table, columns):
+    if name not in {index['name'] for index in inspector.get_indexes(table)}:
+        op.create_index(name, table, columns, unique=False)
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    # Ряды зала для схемы мест
+    if 'rows' not in {column['name'] for column in inspector.get_columns('halls')}:
+        op.add_column('halls', sa.Column('rows', sa.Integer(), server_default='1', nullable=False))
+
+    # Агрегаты отзывов и гистограмма оценок, заполняются по существующим отзывам
+    movie_columns = {column['name'] for column in inspector.get_columns('movies')}
+    if 'audience_score' not in movie_columns:
+        for name, column_type in (('review_count', sa.Integer()), ('review_sum', sa.Integer()), ('audience_score', sa.Float())):
+            if name not in movie_columns:
+                op.add_column('movies', sa.Column(name, column_type, server_default='0', nullable=False))
+        condition = reviews.c.movie_id == movies.c.id
+        op.execute(
+            movies.update().values(
+                review_count=sa.select(sa.func.count()).where(condition).scalar_subquery(),
+                review_sum=sa.select(sa.func.coalesce(sa.func.sum(reviews.c.rating), 0)).where(condition).scalar_subquery(),
+                audience_score=sa.select(sa.func.coalesce(sa.func.avg(reviews.c.rating), 0)).where(condition).scalar_subquery(),
+            )
+        )
+    create_index(inspector, 'ix_movies_audience_score_id', 'movies', ['audience_score', 'id'])
+
+    if 'review_histogram' not in tables:
+        op.create_table('review_histogram',
+        sa.Column('movie_id', sa.Integer(), nullable=False),
+        sa.Column('rating', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['movie_id'], ['movies.id'], ),
+        sa.PrimaryKeyConstraint('movie_id', 'rating')
+        )
+        op.execute(
+            review_histogram.insert().from_select(
+                ['movie_id', 'rating', 'count'],
+                sa.select(reviews.c.movie_id, reviews.c.rating, sa.func.count()).group_by(reviews.c.movie_id, reviews.c.rating),
+            )
+        )
+    create_index(inspector, 'ix_reviews_movie_id_id', 'reviews', ['movie_id', 'id'])
+
+    # Расписание: по времени, по фильму и по залу
+    create_index(inspector, 'ix_sessions_start_time_id', 'sessions', ['start_time', 'id'])
+    create_index(inspector, 'ix_sessions_movie_id_start_time', 'sessions', ['movie_id', 'start_time', 'id'])
+    create_index(inspector, 'ix_sessions_hall_id_start_time', 'sessions', ['hall_id', 'start_time', 'id'])
+
+    # Продажи по сеансам для отчетов, заполняются по проданным билетам
+    if 'session_sales' not in tables:
+        op.create_table('session_sales',
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('movie_id', sa.Integer(), nullable=False),
+        sa.Column('hall_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.Column('tickets_sold', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['hall_id'], ['halls.id'], ),
+        sa.ForeignKeyConstraint(['movie_id'], ['movies.id'], ),
+        sa.ForeignKeyConstraint(['session_id'], ['sessions.id'], ),
+        sa.PrimaryKeyConstraint('session_id')
+        )
+        sold = sa.select(sa.func.count()).where(tickets.c.session_id == sessions.c.id).scalar_subquery()
+        op.execute(
+            session_sales.insert().from_select(
+                ['session_id', 'movie_id', 'hall_id', 'day', 'capacity', 'tickets_sold', 'revenue'],
+                sa.select(
+                    sessions.c.id, sessions.c.movie_id, sessions.c.hall_id, sa.func.date(sessions.c.start_time),
+                    halls.c.capacity, sold, sold * sessions.c.price,
+                ).join_from(sessions, halls, halls.c.id == sessions.c.hall_id),
+            )
+        )
+    create_index(inspector, 'ix_session_sales_day', 'session_sales', ['day'])
+
+    # Одно место сеанса продается один раз
+    constraints = {constraint['name'] for constraint in inspector.get_unique_constraints('tickets')}
+    if 'uq_tickets_session_seat' not in constraints:
+        duplicates = bind.execute(
+            sa.select(tickets.c.session_id, tickets.c.seat_number)
+            .group_by(tickets.c.session_id, tickets.c.seat_number)
+            .having(sa.func.count() > 1)
+            .limit(10)
+        ).all()
+        if duplicates:
+            seats = ", ".join(f"session {session_id} seat {seat}" for session_id, seat in duplicates)
+            raise RuntimeError(f"Tickets table has seats sold more than once ({seats}); remove the duplicates and rerun migrate")
+        with op.batch_alter_table('tickets') as batch_op:
+            batch_op.create_unique_constraint('uq_tickets_session_seat', ['session_id', 'seat_number'])
+    create_index(inspector, 'ix_tickets_user_id_id', 'tickets', ['user_id', 'id'])
+    create_index(inspector, 'ix_tickets_purchased_at_id', 'tickets', ['purchased_at', 'id'])
+
+    # Полнотекстовый индекс фильмов (app/search.py) есть только в SQLite с FTS5
+    if bind.dialect.name == "sqlite" and 'movies_fts' not in tables:
+        try:
+            op.execute(
+                "CREATE VIRTUAL TABLE movies_fts USING fts5("
+                "title, genre, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+            op.execute(
+                "INSERT INTO movies_fts (rowid, title, genre, description) "
+                "SELECT id, title, genre, COALESCE(description, '') FROM movies"
+            )
+        except sa.exc.OperationalError:
+            pass
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS movies_fts")
+    op.drop_index('ix_tickets_purchased_at_id', table_name='tickets')
+    op.drop_index('ix_tickets_user_id_id', table_name='tickets')
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.drop_constraint('uq_tickets_session_seat', type_='unique')
+    op.drop_table('session_sales')
+    op.drop_index('ix_sessions_hall_id_start_time', table_name='sessions')
+    op.drop_index('ix_sessions_movie_id_start_time', table_name='sessions')
+    op.drop_index('ix_sessions_start_time_id', table_name='sessions')
+    op.drop_index('ix_reviews_movie_id_id', table_name='reviews')
+    op.drop_table('review_histogram')
+    op.drop_index('ix_movies_audience_score_id', table_name='movies')
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.drop_column('audience_score')
+        batch_op.drop_column('review_sum')
+        batch_op.drop_column('review_count')
+    with op.batch_alter_table('halls') as batch_op:
+        batch_op.drop_column('rows')
@@ -0,0 +1,34 @@
+"""ticket price
+
+Цена, по которой продан билет: выручка в отчетах и при пересчете session_sales
+не зависит от последующей смены цены сеанса. Для уже проданных билетов берется
+текущая цена сеанса.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 17:05:12
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+tickets = sa.table('tickets', sa.column('session_id'), sa.column('price'))
+sessions = sa.table('sessions', sa.column('id'), sa.column('price'))
+
+def upgrade():
+    op.add_column('tickets', sa.Column('price', sa.Float(), nullable=True))
+    op.execute(
+        tickets.update().values(
+            price=sa.select(sessions.c.price).where(sessions.c.id == tickets.c.session_id).scalar_subquery()
+        )
+    )
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.alter_column('price', existing_type=sa.Float(), nullable=False)
+
+def downgrade():
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.drop_column('price')
@@ -0,0 +1,70 @@
+"""movies full-text index kept in sync by triggers
+
+Полнотекстовый индекс становится external content таблицей над movies и
+обновляется триггерами: фильмы, добавленные в обход crud (seed, импорт, SQL),
+тоже находятся поиском.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 18:10:37
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+COLUMNS = "title, genre, description"
+OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+TRIGGERS = (
+    "CREATE TRIGGER movies_fts_insert AFTER INSERT ON movies BEGIN "
+    "INSERT INTO movies_fts (rowid, title, genre, description) VALUES (new.id, new.title, new.genre, new.description); "
+    "END",
+    "CREATE TRIGGER movies_fts_delete AFTER DELETE ON movies BEGIN "
+    "INSERT INTO movies_fts (movies_fts, rowid, title, genre, description) "
+    "VALUES ('delete', old.id, old.title, old.genre, old.description); "
+    "END",
+    # Только при смене индексируемых колонок, а не при каждом пересчете агрегатов отзывов
+    "CREATE TRIGGER movies_fts_update AFTER UPDATE OF title, genre, description ON movies BEGIN "
+    "INSERT INTO movies_fts (movies_fts, rowid, title, genre, description) "
+    "VALUES ('delete', old.id, old.title, old.genre, old.description); "
+    "INSERT INTO movies_fts (rowid, title, genre, description) VALUES (new.id, new.title, new.genre, new.description); "
+    "END",
+)
+
+def drop_triggers():
+    for name in ("movies_fts_insert", "movies_fts_delete", "movies_fts_update"):
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+def upgrade():
+    # Индекс есть только в SQLite с FTS5 (см. 0002)
+    bind = op.get_bind()
+    if bind.dialect.name != "sqlite":
+        return
+    drop_triggers()
+    op.execute("DROP TABLE IF EXISTS movies_fts")
+    try:
+        op.execute(f"CREATE VIRTUAL TABLE movies_fts USING fts5({COLUMNS}, content = 'movies', content_rowid = 'id', {OPTIONS})")
+    except sa.exc.OperationalError:
+        return
+    for trigger in TRIGGERS:
+        op.execute(trigger)
+    op.execute("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')")
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "sqlite":
+        return
+    drop_triggers()
+    op.execute("DROP TABLE IF EXISTS movies_fts")
+    try:
+        op.execute(f"CREATE VIRTUAL TABLE movies_fts USING fts5({COLUMNS}, {OPTIONS})")
+    except sa.exc.OperationalError:
+        return
+    op.execute(
+        "INSERT INTO movies_fts (rowid, title, genre, description) "
+        "SELECT id, title, genre, COALESCE(description, '') FROM movies"
+    )
@@ -1,204 +1,328 @@
-from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine
-from app import models, crud, schemas
+from array import array
+from bisect import bisect
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+from sqlalchemy import bindparam, delete, func, insert, select, text, update
 from app.auth import get_password_hash
+from app.database import engine
+from app import models, seats
+from manage import migrate
+import argparse
 import logging
+import math
+import random
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_tables():
-    models.Base.metadata.create_all(bind=engine)
+# Генератор данных: пачечные вставки, детерминированно по --seed и --start-date.
+# Без параметров создает небольшую демо-базу, с параметрами - базу production-размера:
+#   python seed.py --users 1000000 --movies 10000 --sessions 500000 --tickets 50000000
 
-def seed_database():
-    db = SessionLocal()
-    try:
-        # Создаем пользователей
-        users_data = [
-            {
-                "username": "admin",
-                "email": "admin@cinema.com",
-                "password": "admin123",
-                "role": "admin"
-            },
-            {
-                "username": "cashier",
-                "email": "cashier@cinema.com", 
-                "password": "cashier123",
-                "role": "cashier"
-            },
-            {
-                "username": "viewer1",
-                "email": "viewer1@cinema.com",
-                "password": "viewer123", 
-                "role": "viewer"
-            },
-            {
-                "username": "viewer2",
-                "email": "viewer2@cinema.com",
-                "password": "viewer123",
-                "role": "viewer"
-            }
-        ]
-        
-        for user_data in users_data:
-            existing_user = db.query(models.User).filter(
-                models.User.username == user_data["username"]
-            ).first()
-            if not existing_user:
-                user_schema = schemas.UserCreate(**user_data)
-                crud.create_user(db, user_schema)
-                logger.info(f"Created user: {user_data['username']}")
-        
-        # Создаем залы
-        halls_data = [
-            {"name": "Зал 1", "capacity": 100},
-            {"name": "Зал 2", "capacity": 150},
-            {"name": "Зал 3", "capacity": 80},
-            {"name": "IMAX Зал", "capacity": 200}
-        ]
-        
-        for hall_data in halls_data:
-            existing_hall = db.query(models.Hall).filter(
-                models.Hall.name == hall_data["name"]
-            ).first()
-            if not existing_hall:
-                hall_schema = schemas.HallCreate(**hall_data)
-                crud.create_hall(db, hall_schema)
-                logger.info(f"Created hall: {hall_data['name']}")
-        
-        # Создаем фильмы
-        movies_data = [
-            {
-                "title": "Мстители: Финал",
-                "genre": "action",
-                "duration": 181,
-                "rating": 8.4,
-                "description": "Эпический финал саги о Мстителях"
-            },
-            {
-                "title": "Джокер",
-                "genre": "drama", 
-                "duration": 122,
-                "rating": 8.5,
-                "description": "История происхождения самого известного злодея"
-            },
-            {
-                "title": "Человек-паук: Нет пути домой",
-                "genre": "action",
-                "duration": 148,
-                "rating": 8.2,
-                "description": "Мультивселенная Человека-паука"
-            },
-            {
-                "title": "Дюна",
-                "genre": "sci-fi",
-                "duration": 155,
-                "rating": 8.0,
-                "description": "Эпическая научная фантастика Дени Вильнёва"
-            },
-            {
-                "title": "Не время умирать",
-                "genre": "action",
-                "duration": 163,
-                "rating": 7.3,
-                "description": "Последний фильм о Джеймсе Бонде с Дэниелом Крейгом"
-            },
-            {
-                "title": "Парасит",
-                "genre": "thriller",
-                "duration": 132,
-                "rating": 8.6,
-                "description": "Корейский триллер, получивший Оскар"
-            },
-            {
-                "title": "Форма воды",
-                "genre": "fantasy",
-                "duration": 123,
-                "rating": 7.3,
-                "description": "Романтическая фантастика Гильермо дель Торо"
-            },
-            {
-                "title": "Интерстеллар",
-                "genre": "sci-fi",
-                "duration": 169,
-                "rating": 8.6,
-                "description": "Космическая одиссея Кристофера Нолана"
-            },
-            {
-                "title": "Однажды в Голливуде",
-                "genre": "comedy",
-                "duration": 161,
-                "rating": 7.6,
-                "description": "Комедийная драма Квентина Тарантино"
-            },
-            {
-                "title": "Зеленая книга",
-                "genre": "drama",
-                "duration": 130,
-                "rating": 8.2,
-                "description": "Драма о дружбе и преодолении предрассудков"
+DEMO_USERS = [
+    {"username": "admin", "email": "admin@cinema.com", "password": "admin123", "role": "admin"},
+    {"username": "cashier", "email": "cashier@cinema.com", "password": "cashier123", "role": "cashier"},
+    {"username": "viewer1", "email": "viewer1@cinema.com", "password": "viewer123", "role": "viewer"},
+    {"username": "viewer2", "email": "viewer2@cinema.com", "password": "viewer123", "role": "viewer"},
+]
+DEMO_HALLS = [
+    {"name": "Зал 1", "capacity": 100, "rows": 10},
+    {"name": "Зал 2", "capacity": 150, "rows": 10},
+    {"name": "Зал 3", "capacity": 80, "rows": 8},
+    {"name": "IMAX Зал", "capacity": 200, "rows": 10},
+]
+DEMO_MOVIES = [
+    ("Мстители: Финал", "action", 181, 8.4, "Эпический финал саги о Мстителях"),
+    ("Джокер", "drama", 122, 8.5, "История происхождения самого известного злодея"),
+    ("Человек-паук: Нет пути домой", "action", 148, 8.2, "Мультивселенная Человека-паука"),
+    ("Дюна", "sci-fi", 155, 8.0, "Эпическая научная фантастика Дени Вильнёва"),
+    ("Не время умирать", "action", 163, 7.3, "Последний фильм о Джеймсе Бонде с Дэниелом Крейгом"),
+    ("Парасит", "thriller", 132, 8.6, "Корейский триллер, получивший Оскар"),
+    ("Форма воды", "fantasy", 123, 7.3, "Романтическая фантастика Гильермо дель Торо"),
+    ("Интерстеллар", "sci-fi", 169, 8.6, "Космическая одиссея Кристофера Нолана"),
+    ("Однажды в Голливуде", "comedy", 161, 7.6, "Комедийная драма Квентина Тарантино"),
+    ("Зеленая книга", "drama", 130, 8.2, "Драма о дружбе и преодолении предрассудков"),
+]
+GENRES = ["action", "drama", "comedy", "sci-fi", "thriller", "fantasy", "horror", "animation"]
+HALL_SIZES = [80, 120, 150, 200, 300, 400]
+# Пароль сгенерированных пользователей user1, user2, ...: хеш считается один раз на всех
+SYNTHETIC_PASSWORD = "password123"
+BATCH_SIZE = 50000
+
+# Расписание зала: первый сеанс в 10:00, последний начинается не позже 23:30, между сеансами уборка
+OPENING = 10 * 60
+LAST_START = 23 * 60 + 30
+# Расписание начинается за PAST_DAYS до --start-date; на сеансы дальше ON_SALE_DAYS продажи еще не открыты
+PAST_DAYS = 30
+ON_SALE_DAYS = 21
+# Без --halls залов столько, чтобы расписание заняло около SCHEDULE_DAYS дней по 5 сеансов в зале
+SCHEDULE_DAYS = 60
+# Популярность фильма по закону Ципфа: вес фильма ранга r - 1 / r ** ZIPF
+ZIPF = 1.0
+
+def insert_batches(conn, table, rows, batch_size: int) -> int:
+    # Строки приходят генератором, в памяти держится одна пачка
+    batch, total = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.execute(insert(table), batch)
+            conn.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert(table), batch)
+        conn.commit()
+        total += len(batch)
+    return total
+
+def reset(conn):
+    for table in (
+        models.Ticket, models.SessionSales, models.Session, models.Review,
+        models.ReviewHistogram, models.Movie, models.Hall, models.User,
+    ):
+        conn.execute(delete(table))
+    conn.commit()
+
+def users(args, hashed_password: str):
+    for i, user in enumerate(DEMO_USERS, start=1):
+        yield {
+            "id": i, "username": user["username"], "email": user["email"],
+            "hashed_password": get_password_hash(user["password"]), "role": user["role"],
+        }
+    for i in range(1, args.users + 1):
+        yield {
+            "id": len(DEMO_USERS) + i, "username": f"user{i}", "email": f"user{i}@example.com",
+            "hashed_password": hashed_password, "role": "viewer",
+        }
+
+def halls(args, rng: random.Random) -> list:
+    result = [dict(hall, id=i) for i, hall in enumerate(DEMO_HALLS, start=1)]
+    for i in range(len(DEMO_HALLS) + 1, args.halls + 1):
+        capacity = rng.choice(HALL_SIZES)
+        result.append({"id": i, "name": f"Зал {i}", "capacity": capacity, "rows": max(1, capacity // 20)})
+    return result[:args.halls]
+
+def movies(args, rng: random.Random) -> list:
+    result = [
+        {"id": i, "title": title, "genre": genre, "duration": duration, "rating": rating, "description": description}
+        for i, (title, genre, duration, rating, description) in enumerate(DEMO_MOVIES, start=1)
+    ]
+    for i in range(len(DEMO_MOVIES) + 1, args.movies + 1):
+        genre = rng.choice(GENRES)
+        result.append({
+            "id": i,
+            "title": f"Фильм {i}",
+            "genre": genre,
+            "duration": rng.randint(80, 180),
+            "rating": round(rng.uniform(4.0, 9.5), 1),
+            "description": f"Сгенерированный фильм в жанре {genre}",
+        })
+    return result[:args.movies]
+
+def reviews(args, rng: random.Random, movie_rows: list, weights: list, stats: dict):
+    # Число отзывов фильма пропорционально популярности; один отзыв на фильм от пользователя
+    total_users = len(DEMO_USERS) + args.users
+    total_weight = sum(weights)
+    for movie, weight in zip(movie_rows, weights):
+        count = min(total_users, round(args.reviews * weight / total_weight))
+        histogram = stats[movie["id"]] = [0] * 11
+        for user_id in rng.sample(range(1, total_users + 1), count):
+            rating = min(10, max(1, round(rng.gauss(movie["rating"], 1.5))))
+            histogram[rating] += 1
+            yield {"movie_id": movie["id"], "user_id": user_id, "rating": rating, "comment": "Отзыв зрителя"}
+
+class Schedule:
+    # Параметры сеансов в плоских массивах: второй проход по ним раскладывает билеты
+    def __init__(self):
+        self.movie = array("i")
+        self.hall = array("i")
+        self.start = array("q")
+        self.price = array("d")
+        self.demand = array("d")
+
+def sessions(args, rng: random.Random, hall_rows: list, movie_rows: list, weights: list, schedule: Schedule):
+    # Сеансы зала идут подряд без пересечений: фильм, затем уборка 15-30 минут
+    cum_weights = list(accumulate(weights))
+    first_day = datetime.combine(args.start_date - timedelta(days=PAST_DAYS), time())
+    today = datetime.combine(args.start_date, time())
+    session_id = 0
+    day = 0
+    while session_id < args.sessions:
+        for hall in hall_rows:
+            minute = OPENING + rng.randrange(0, 30, 5)
+            while minute <= LAST_START and session_id < args.sessions:
+                session_id += 1
+                movie_index = bisect(cum_weights, rng.random() * cum_weights[-1])
+                movie = movie_rows[movie_index]
+                start_time = first_day + timedelta(days=day, minutes=minute)
+                price = float(rng.choice([300, 350, 400, 450]) + (150 if minute >= 18 * 60 else 0))
+                # Спрос: популярность фильма, близость даты и случайный разброс; хиты распродаются
+                days_ahead = (start_time - today).total_seconds() / 86400
+                if days_ahead > ON_SALE_DAYS:
+                    recency = 0.0
+                elif days_ahead > 0:
+                    recency = math.exp(-days_ahead / 7)
+                else:
+                    recency = 1.0
+                schedule.movie.append(movie_index)
+                schedule.hall.append(hall["id"])
+                schedule.start.append(int(start_time.timestamp()))
+                schedule.price.append(price)
+                schedule.demand.append(weights[movie_index] ** 0.7 * recency * rng.lognormvariate(0, 0.5))
+                yield {
+                    "id": session_id, "movie_id": movie["id"], "hall_id": hall["id"],
+                    "start_time": start_time, "price": price,
+                }
+                minute += movie["duration"] + rng.randrange(15, 35, 5)
+                minute += -minute % 5
+            if session_id >= args.sessions:
+                break
+        day += 1
+
+def sold_counts(target: int, schedule: Schedule, capacity: dict) -> array:
+    # Множитель спроса подбирается так, чтобы с учетом вместимости залов продалось около target билетов
+    capacities = [capacity[hall_id] for hall_id in schedule.hall]
+    target = min(target, sum(capacity for capacity, demand in zip(capacities, schedule.demand) if demand > 0))
+    total_demand = sum(schedule.demand)
+    scale = target / total_demand if total_demand else 0.0
+    for _ in range(20):
+        total = sum(min(capacity, demand * scale) for capacity, demand in zip(capacities, schedule.demand))
+        if not total or abs(total - target) < 0.001 * target:
+            break
+        scale *= target / total
+    return array("i", (min(capacity, int(demand * scale)) for capacity, demand in zip(capacities, schedule.demand)))
+
+def tickets(args, rng: random.Random, schedule: Schedule, hall_rows: list, sold: array):
+    hall_labels = {}
+    for hall in hall_rows:
+        layout = seats.SeatLayout(hall["capacity"], hall["rows"])
+        hall_labels[hall["id"]] = [layout.label(index) for index in range(hall["capacity"])]
+    total_users = len(DEMO_USERS) + args.users
+    today = datetime.combine(args.start_date, time()).timestamp()
+    for index, count in enumerate(sold):
+        if not count:
+            continue
+        labels = hall_labels[schedule.hall[index]]
+        # Билеты покупаются за 0-14 дней до сеанса, но не позже --start-date
+        sold_until = min(schedule.start[index], today)
+        for seat in rng.sample(range(len(labels)), count):
+            yield {
+                "session_id": index + 1,
+                "user_id": rng.randint(1, total_users),
+                "seat_number": labels[seat],
+                "price": schedule.price[index],
+                "purchased_at": datetime.fromtimestamp(sold_until - rng.randrange(14 * 86400)),
             }
-        ]
-        
-        for movie_data in movies_data:
-            existing_movie = db.query(models.Movie).filter(
-                models.Movie.title == movie_data["title"]
-            ).first()
-            if not existing_movie:
-                movie_schema = schemas.MovieCreate(**movie_data)
-                crud.create_movie(db, movie_schema)
-                logger.info(f"Created movie: {movie_data['title']}")
-        
-        # Создаем сеансы
-        from datetime import datetime, timedelta
-        
-        sessions_data = [
-            {
-                "movie_id": 1,
-                "hall_id": 1,
-                "start_time": datetime.now() + timedelta(hours=2),
-                "price": 350.0
-            },
-            {
-                "movie_id": 1,
-                "hall_id": 1,
-                "start_time": datetime.now() + timedelta(hours=6),
-                "price": 400.0
-            },
-            {
-                "movie_id": 2,
-                "hall_id": 2,
-                "start_time": datetime.now() + timedelta(hours=3),
-                "price": 300.0
-            },
-            {
-                "movie_id": 3,
-                "hall_id": 4,
-                "start_time": datetime.now() + timedelta(hours=4),
-                "price": 500.0
-            },
+
+def generate(args):
+    rng = random.Random(args.seed)
+    with engine.connect() as conn:
+        if args.reset:
+            reset(conn)
+        elif conn.scalar(select(func.count()).select_from(models.Movie)):
+            logger.info("Database already has data, nothing to do (use --reset to regenerate)")
+            return
+        if conn.dialect.name == "sqlite":
+            # Скорость загрузки важнее устойчивости к сбою: при ошибке базу проще сгенерировать заново
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+
+        count = insert_batches(conn, models.User.__table__, users(args, get_password_hash(SYNTHETIC_PASSWORD)), args.batch_size)
+        logger.info(f"Created users: {count}")
+
+        hall_rows = halls(args, rng)
+        movie_rows = movies(args, rng)
+        weights = [1 / rank ** ZIPF for rank in range(1, len(movie_rows) + 1)]
+        insert_batches(conn, models.Hall.__table__, hall_rows, args.batch_size)
+
+        for movie in movie_rows:
+            movie.update(review_count=0, review_sum=0, audience_score=0)
+        insert_batches(conn, models.Movie.__table__, movie_rows, args.batch_size)
+        logger.info(f"Created halls: {len(hall_rows)}, movies: {len(movie_rows)}")
+
+        # Агрегаты отзывов копятся при генерации и записываются одним обновлением на все фильмы
+        review_stats = {}
+        count = insert_batches(
+            conn, models.Review.__table__, reviews(args, rng, movie_rows, weights, review_stats), args.batch_size
+        )
+        aggregates = []
+        for movie_id, histogram in review_stats.items():
+            review_count = sum(histogram)
+            if review_count:
+                review_sum = sum(rating * count for rating, count in enumerate(histogram))
+                aggregates.append({
+                    "movie": movie_id,
+                    "count": review_count,
+                    "sum": review_sum,
+                    "score": review_sum / review_count,
+                })
+        if aggregates:
+            conn.execute(
+                update(models.Movie.__table__)
+                .where(models.Movie.id == bindparam("movie"))
+                .values(review_count=bindparam("count"), review_sum=bindparam("sum"), audience_score=bindparam("score")),
+                aggregates
+            )
+        insert_batches(conn, models.ReviewHistogram.__table__, (
+            {"movie_id": movie_id, "rating": rating, "count": count}
+            for movie_id, histogram in review_stats.items()
+            for rating, count in enumerate(histogram) if count
+        ), args.batch_size)
+        logger.info(f"Created reviews: {count}")
+
+        schedule = Schedule()
+        count = insert_batches(
+            conn, models.Session.__table__,
+            sessions(args, rng, hall_rows, movie_rows, weights, schedule),
+            args.batch_size
+        )
+        logger.info(f"Created sessions: {count}")
+
+        capacity = {hall["id"]: hall["capacity"] for hall in hall_rows}
+        sold = sold_counts(args.tickets, schedule, capacity)
+        count = insert_batches(conn, models.Ticket.__table__, tickets(args, rng, schedule, hall_rows, sold), args.batch_size)
+        insert_batches(conn, models.SessionSales.__table__, (
             {
-                "movie_id": 4,
-                "hall_id": 3,
-                "start_time": datetime.now() + timedelta(hours=5),
-                "price": 450.0
+                "session_id": index + 1,
+                "movie_id": movie_rows[schedule.movie[index]]["id"],
+                "hall_id": schedule.hall[index],
+                "day": datetime.fromtimestamp(schedule.start[index]).date(),
+                "capacity": capacity[schedule.hall[index]],
+                "tickets_sold": sold[index],
+                "revenue": sold[index] * schedule.price[index],
             }
-        ]
-        
-        for session_data in sessions_data:
-            session_schema = schemas.SessionCreate(**session_data)
-            crud.create_session(db, session_schema)
-            logger.info(f"Created session for movie {session_data['movie_id']}")
-        
-        logger.info("Database seeded successfully!")
-        
-    except Exception as e:
-        logger.error(f"Error seeding database: {e}")
-        db.rollback()
-    finally:
-        db.close()
+            for index in range(len(sold))
+        ), args.batch_size)
+        logger.info(f"Created tickets: {count}, sold out sessions: {sum(1 for index, count in enumerate(sold) if count and count == capacity[schedule.hall[index]])}")
+
+        if conn.dialect.name == "postgresql":
+            # id вставлены явно, последовательности переводятся за последний id
+            for table in ("users", "halls", "movies", "sessions"):
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 1)) FROM {table}"
+                ))
+        conn.commit()
+    logger.info("Database seeded successfully!")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация данных Cinema Management System")
+    parser.add_argument("--users", type=int, default=100, help="пользователи user1..userN (пароль password123)")
+    parser.add_argument("--movies", type=int, default=len(DEMO_MOVIES))
+    parser.add_argument("--halls", type=int, help=f"по умолчанию - чтобы расписание заняло около {SCHEDULE_DAYS} дней")
+    parser.add_argument("--sessions", type=int, default=1200)
+    parser.add_argument("--tickets", type=int, default=50000, help="примерное число проданных билетов")
+    parser.add_argument("--reviews", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date.today(),
+                        help="\"сегодня\" генерации: расписание начинается за 30 дней до нее")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--reset", action="store_true", help="удалить существующие данные")
+    args = parser.parse_args(argv)
+    if args.halls is None:
+        args.halls = max(len(DEMO_HALLS), math.ceil(args.sessions / (5 * SCHEDULE_DAYS)))
+    return args
 
 if __name__ == "__main__":
-    create_tables()
-    seed_database()
\ No newline at end of file
+    args = parse_args()
+    migrate()
+    generate(args)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+
+# Настройки читаются при импорте приложения: отдельная база SQLite, быстрый bcrypt,
+# без контроля допуска и лога доступа
+_workdir = tempfile.mkdtemp(prefix="cinema-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_workdir}/test.db"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["ACCESS_LOG_SAMPLE_RATE"] = "0"
+for name in ("PURCHASE", "LOGIN"):
+    os.environ[f"ADMISSION_{name}_RATE"] = "0"
+    os.environ[f"ADMISSION_{name}_USER_RATE"] = "0"
+
+from datetime import datetime, timedelta
+from itertools import count
+
+import httpx
+import pytest
+
+from app import models
+from app.auth import create_access_token
+from app.database import SessionLocal, async_engine
+from app.main import app
+from manage import migrate
+
+_ids = count(1)
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    migrate()
+
+@pytest.fixture
+async def client():
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+    # Соединения пула привязаны к event loop теста
+    await async_engine.dispose()
+
+@pytest.fixture(scope="session")
+def make_users():
+    # Пользователи создаются напрямую в БД, в ответ - пары (id, заголовки авторизации)
+    def make(n, role="viewer"):
+        with SessionLocal() as db:
+            users = []
+            for _ in range(n):
+                username = f"user{next(_ids)}"
+                users.append(models.User(username=username, email=f"{username}@example.com", hashed_password="-", role=role))
+            db.add_all(users)
+            db.commit()
+            return [
+                (user.id, {"Authorization": f"Bearer {create_access_token({'sub': user.username})}"})
+                for user in users
+            ]
+    return make
+
+@pytest.fixture(scope="session")
+def make_session():
+    # Новый зал и фильм на каждый сеанс, чтобы тесты не делили места и расписание
+    def make(capacity=50, rows=5, price=300.0):
+        with SessionLocal() as db:
+            hall = models.Hall(name=f"Hall {next(_ids)}", capacity=capacity, rows=rows)
+            movie = models.Movie(title=f"Movie {next(_ids)}", genre="drama", duration=120, rating=7.5)
+            session = models.Session(movie=movie, hall=hall, start_time=datetime.now() + timedelta(days=1), price=price)
+            db.add(session)
+            db.commit()
+            return session.id
+    return make
@@ -0,0 +1,32 @@
+import httpx
+import pytest
+
+from app import admission, models
+from app.auth import get_password_hash
+from app.database import SessionLocal
+from app.main import app
+
+pytestmark = pytest.mark.anyio
+
+def client_from(host):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(host, 50000)), base_url="http://test")
+
+async def test_failed_logins_from_another_address_do_not_lock_out_user(client, monkeypatch):
+    with SessionLocal() as db:
+        db.add(models.User(
+            username="victim", email="victim@example.com", hashed_password=get_password_hash("secret123")
+        ))
+        db.commit()
+    # Только ограничение на пару адрес + имя: 2 попытки сразу, следующая почти через минуту
+    monkeypatch.setattr(admission, "login", admission.Gate("login", 0, 0, 0.02, 2))
+
+    async with client_from("203.0.113.7") as attacker:
+        statuses = [
+            (await attacker.post("/auth/login", data={"username": "victim", "password": "wrong"})).status_code
+            for _ in range(3)
+        ]
+    assert statuses == [401, 401, 429]
+
+    async with client_from("198.51.100.20") as victim:
+        response = await victim.post("/auth/login", data={"username": "victim", "password": "secret123"})
+    assert response.status_code == 200
@@ -0,0 +1,53 @@
+import pytest
+
+from app import auth, models
+from app.database import SessionLocal
+
+pytestmark = pytest.mark.anyio
+
+REPORT = "/api/reports/revenue"
+
+def set_role(user_id, role):
+    with SessionLocal() as db:
+        db.get(models.User, user_id).role = role
+        db.commit()
+
+async def test_repeated_requests_use_cached_principal(client, make_users):
+    (_, headers), = make_users(1)
+    assert (await client.get("/api/tickets/my", headers=headers)).status_code == 200
+    hits, misses = auth.principal_stats["hits"], auth.principal_stats["misses"]
+    for _ in range(3):
+        assert (await client.get("/api/tickets/my", headers=headers)).status_code == 200
+    assert auth.principal_stats["hits"] == hits + 3
+    assert auth.principal_stats["misses"] == misses
+
+async def test_role_change_drops_cached_principal(client, make_users):
+    (user_id, headers), = make_users(1)
+    assert (await client.get(REPORT, headers=headers)).status_code == 403
+    set_role(user_id, "admin")
+    assert (await client.get(REPORT, headers=headers)).status_code == 200
+    set_role(user_id, "viewer")
+    assert (await client.get(REPORT, headers=headers)).status_code == 403
+
+async def test_deleted_user_is_rejected(client, make_users):
+    (user_id, headers), = make_users(1)
+    assert (await client.get("/api/tickets/my", headers=headers)).status_code == 200
+    with SessionLocal() as db:
+        db.delete(db.get(models.User, user_id))
+        db.commit()
+    assert (await client.get("/api/tickets/my", headers=headers)).status_code == 401
+
+async def test_expired_entry_is_reloaded(client, make_users, monkeypatch):
+    monkeypatch.setattr(auth, "PRINCIPAL_CACHE_TTL", 0)
+    (_, headers), = make_users(1)
+    misses = auth.principal_stats["misses"]
+    for _ in range(2):
+        assert (await client.get("/api/tickets/my", headers=headers)).status_code == 200
+    assert auth.principal_stats["misses"] == misses + 2
+
+async def test_cache_size_is_bounded(client, make_users, monkeypatch):
+    monkeypatch.setattr(auth, "PRINCIPAL_CACHE_SIZE", 2)
+    for _, headers in make_users(3):
+        assert (await client.get("/api/tickets/my", headers=headers)).status_code == 200
+    assert len(auth._principals) == 2
+    assert sum(len(tokens) for tokens in auth._principal_tokens.values()) == 2
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import func
+
+from app import cache, models, pagination
+from app.database import SessionLocal
+
+pytestmark = pytest.mark.anyio
+
+def put(store, key, body, tags):
+    return store.put(key, body, tags=tags, generation=store.generation)
+
+def test_invalidate_drops_only_tagged_entries():
+    store = cache.ResponseCache(maxsize=10, ttl=60)
+    put(store, "movie-1", b"1", ["movies", "movie:1"])
+    put(store, "movie-2", b"2", ["movies", "movie:2"])
+    put(store, "hall-1", b"h", ["halls"])
+
+    store.invalidate("movie:1")
+    assert store.get("movie-1") is None
+    assert store.get("movie-2").body == b"2"
+
+    store.invalidate("movies")
+    assert store.get("movie-2") is None
+    assert store.get("hall-1").body == b"h"
+    assert store.stats()["invalidations"] == 2
+
+def test_response_built_before_a_write_is_not_stored():
+    store = cache.ResponseCache(maxsize=10, ttl=60)
+    generation = store.generation
+    store.invalidate("movies")
+    response = store.put("movie-1", b"stale", tags=["movies"], generation=generation)
+    assert response.body == b"stale"
+    assert store.get("movie-1") is None
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    store = cache.ResponseCache(maxsize=2, ttl=60)
+    put(store, "a", b"a", ["t"])
+    put(store, "b", b"b", ["t"])
+    assert store.get("a") is not None
+    put(store, "c", b"c", ["t"])
+    assert store.get("b") is None
+    assert store.stats()["evictions"] == 1
+
+    now = cache.time.monotonic()
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 61)
+    assert store.get("a") is None
+    assert store.stats()["expirations"] == 1
+
+async def test_movie_update_invalidates_movie_and_session(client, make_users, make_session):
+    session_id = make_session()
+    (_, admin), = make_users(1, role="admin")
+    session = (await client.get(f"/api/sessions/{session_id}")).json()
+    movie_id = session["movie_id"]
+    assert (await client.get(f"/api/movies/{movie_id}")).status_code == 200
+
+    hits = cache.catalog.hits
+    assert (await client.get(f"/api/movies/{movie_id}")).json()["title"] == session["movie"]["title"]
+    assert (await client.get(f"/api/sessions/{session_id}")).status_code == 200
+    assert cache.catalog.hits == hits + 2
+
+    response = await client.put(f"/api/movies/{movie_id}", json={"title": "Renamed"}, headers=admin)
+    assert response.status_code == 200
+    assert (await client.get(f"/api/movies/{movie_id}")).json()["title"] == "Renamed"
+    assert (await client.get(f"/api/sessions/{session_id}")).json()["movie"]["title"] == "Renamed"
+
+async def test_hall_create_invalidates_hall_list(client, make_users):
+    (_, admin), = make_users(1, role="admin")
+    # Страница после последнего зала пуста и попадает в кэш
+    with SessionLocal() as db:
+        cursor = pagination.encode_cursor([db.query(func.max(models.Hall.id)).scalar()])
+    assert (await client.get("/api/halls/", params={"cursor": cursor})).json() == []
+    assert (await client.get("/api/halls/", params={"cursor": cursor})).json() == []
+
+    response = await client.post("/api/halls/", json={"name": "Cache hall", "capacity": 30, "rows": 3}, headers=admin)
+    assert response.status_code == 200
+    halls = (await client.get("/api/halls/", params={"cursor": cursor})).json()
+    assert [hall["id"] for hall in halls] == [response.json()["id"]]
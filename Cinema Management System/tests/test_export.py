@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import export
+
+pytestmark = pytest.mark.anyio
+
+SEATS = ["A1", "A2", "B1", "B2", "C5"]
+
+@pytest.fixture
+async def sold_session(client, make_users, make_session):
+    session_id = make_session(price=250.0)
+    (buyer_id, buyer), = make_users(1)
+    response = await client.post("/api/tickets/batch", json={"session_id": session_id, "seat_numbers": SEATS}, headers=buyer)
+    assert response.status_code == 200
+    return session_id, buyer_id
+
+@pytest.fixture
+def admin(make_users):
+    (_, headers), = make_users(1, role="admin")
+    return headers
+
+async def test_ndjson_export(client, sold_session, admin):
+    session_id, buyer_id = sold_session
+    response = await client.get("/api/tickets/export", params={"session_id": session_id}, headers=admin)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["seat_number"] for row in rows) == SEATS
+    assert list(rows[0]) == export.FIELDS
+    assert {(row["session_id"], row["user_id"], row["price"]) for row in rows} == {(session_id, buyer_id, 250.0)}
+    assert [row["ticket_id"] for row in rows] == sorted(row["ticket_id"] for row in rows)
+
+async def test_csv_export(client, sold_session, admin):
+    session_id, _ = sold_session
+    response = await client.get("/api/tickets/export", params={"session_id": session_id, "format": "csv"}, headers=admin)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="tickets.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert sorted(row["seat_number"] for row in rows) == SEATS
+    assert {row["price"] for row in rows} == {"250.0"}
+
+async def test_export_filters_by_purchase_date(client, sold_session, admin):
+    session_id, _ = sold_session
+    yesterday = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    for params, count in (({"date_to": yesterday}, 0), ({"date_from": yesterday}, len(SEATS))):
+        response = await client.get("/api/tickets/export", params={"session_id": session_id, **params}, headers=admin)
+        assert len(response.text.splitlines()) == count
+
+@pytest.mark.parametrize("format, header", [("ndjson", 0), ("csv", 1)])
+async def test_rows_are_sent_in_batches(sold_session, monkeypatch, format, header):
+    session_id, _ = sold_session
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    chunks = [chunk async for chunk in export.stream_tickets(export.tickets_query(session_id=session_id), format)]
+    assert [len(chunk.decode().splitlines()) for chunk in chunks] == [1] * header + [2, 2, 1]
+
+async def test_export_requires_admin(client, make_users):
+    (_, viewer), = make_users(1)
+    assert (await client.get("/api/tickets/export", headers=viewer)).status_code == 403
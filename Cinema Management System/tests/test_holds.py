@@ -0,0 +1,92 @@
+import pytest
+
+from app import holds
+
+pytestmark = pytest.mark.anyio
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Часы только для модуля holds: колесо и брони видят время теста
+    clock = Clock()
+    monkeypatch.setattr(holds, "time", clock)
+    return clock
+
+def test_hold_expires_after_ttl(clock):
+    store = holds.HoldStore(ttl=5, tick=1)
+    hold = store.hold(1, [0, 1], user_id=1, max_seats=10)
+    clock.now += 4.99
+    assert set(store.held(1)) == {0, 1}
+    assert store.get(hold.id) is hold
+    clock.now += 0.01
+    assert store.held(1) == {}
+    assert store.get(hold.id) is None
+
+def test_expiry_across_wheel_wraps(clock):
+    # 7 слотов по секунде: за 40 секунд колесо проходит круг почти шесть раз
+    store = holds.HoldStore(ttl=5, tick=1)
+    created = {}
+    for step in range(20):
+        created[step] = clock.now
+        store.hold(1, [step], user_id=step, max_seats=10)
+        clock.now += 2
+        held = set(store.held(1))
+        assert held == {seat for seat, at in created.items() if clock.now - at < 5}
+    assert len(store._wheel.slots) == 7
+
+def test_jump_longer_than_the_wheel(clock):
+    store = holds.HoldStore(ttl=5, tick=1)
+    store.hold(1, [0], user_id=1, max_seats=10)
+    clock.now += 100
+    assert store.held(1) == {}
+    # После прыжка колесо стоит на текущем тике: новая бронь живет полный срок
+    store.hold(1, [1], user_id=1, max_seats=10)
+    clock.now += 4.5
+    assert set(store.held(1)) == {1}
+    clock.now += 0.5
+    assert store.held(1) == {}
+
+def test_rehold_moves_seats_and_keeps_the_limit(clock):
+    store = holds.HoldStore(ttl=5, tick=1)
+    first = store.hold(1, [0, 1], user_id=1, max_seats=3)
+    with pytest.raises(holds.SeatHeld):
+        store.hold(1, [1, 2], user_id=2, max_seats=3)
+    with pytest.raises(ValueError):
+        store.hold(1, [2, 3], user_id=1, max_seats=3)
+
+    clock.now += 3
+    second = store.hold(1, [1, 2], user_id=1, max_seats=3)
+    assert first.seats == {0}
+    # Перенесенное место живет по сроку новой брони
+    clock.now += 2
+    assert set(store.held(1)) == {1, 2}
+    clock.now += 3
+    assert store.held(1) == {}
+    assert store.get(second.id) is None
+
+async def test_hold_blocks_other_buyers(client, make_users, make_session):
+    session_id = make_session()
+    (_, owner), (_, other) = make_users(2)
+    response = await client.post(f"/api/sessions/{session_id}/holds", json={"seat_numbers": ["A1", "A2"]}, headers=owner)
+    assert response.status_code == 201
+    hold_id = response.json()["id"]
+
+    seat_map = (await client.get(f"/api/sessions/{session_id}/seats")).json()
+    assert (seat_map["held"], seat_map["rows"][0]["seats"][:3]) == (2, "220")
+    response = await client.post(f"/api/sessions/{session_id}/holds", json={"seat_numbers": ["A2"]}, headers=other)
+    assert response.status_code == 409
+    response = await client.post("/api/tickets/", json={"session_id": session_id, "seat_number": "A1"}, headers=other)
+    assert response.status_code == 400
+
+    response = await client.post("/api/tickets/", json={"session_id": session_id, "seat_number": "A1"}, headers=owner)
+    assert response.status_code == 200
+    assert (await client.delete(f"/api/sessions/{session_id}/holds/{hold_id}", headers=other)).status_code == 403
+    assert (await client.delete(f"/api/sessions/{session_id}/holds/{hold_id}", headers=owner)).status_code == 200
+    response = await client.post("/api/tickets/", json={"session_id": session_id, "seat_number": "A2"}, headers=other)
+    assert response.status_code == 200
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import cache, crud, models, pagination
+from app.database import SessionLocal
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def hall_schedule():
+    # Пять сеансов в отдельном зале с интервалом в три часа
+    with SessionLocal() as db:
+        hall = models.Hall(name="Paging hall", capacity=20, rows=2)
+        movie = models.Movie(title="Paging movie", genre="drama", duration=90, rating=7.0)
+        start = datetime.now().replace(microsecond=0) + timedelta(days=3)
+        sessions = [
+            models.Session(movie=movie, hall=hall, start_time=start + timedelta(hours=3 * i), price=250.0)
+            for i in range(5)
+        ]
+        db.add_all(sessions)
+        db.commit()
+        return hall.id, [session.id for session in sessions]
+
+async def walk(client, path, limit, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, limit=limit)
+        if cursor:
+            query["cursor"] = cursor
+        response = await client.get(path, params=query)
+        assert response.status_code == 200
+        ids += [item["id"] for item in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids, pages
+
+async def test_session_cursor_round_trip(client, hall_schedule):
+    hall_id, session_ids = hall_schedule
+    ids, pages = await walk(client, "/api/sessions/", 2, hall_id=hall_id)
+    assert ids == session_ids
+    assert pages == 3
+
+async def test_hall_cursor_round_trip(client, hall_schedule):
+    cache.catalog.clear()
+    with SessionLocal() as db:
+        expected = [hall.id for hall in db.query(models.Hall).order_by(*crud.HALL_ORDER)]
+    ids, pages = await walk(client, "/api/halls/", 3)
+    assert ids == expected
+    # Курсор выдается, только если за страницей есть строки: полная последняя страница - последняя
+    assert pages == max(1, -(-len(expected) // 3))
+
+async def test_invalid_cursor(client):
+    response = await client.get("/api/sessions/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("path", ["/api/sessions/", "/api/halls/"])
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": -1}, {"limit": 101}, {"skip": -1}])
+async def test_limit_out_of_range(client, path, params):
+    response = await client.get(path, params=params)
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("path", ["/api/sessions/", "/api/halls/"])
+@pytest.mark.parametrize("limit", [1, 100])
+async def test_limit_bounds(client, hall_schedule, path, limit):
+    response = await client.get(path, params={"limit": limit})
+    assert response.status_code == 200
+    assert 1 <= len(response.json()) <= limit
+
+def test_empty_page_has_no_cursor():
+    rows = [models.Hall(id=1, name="A", capacity=10, rows=1)]
+    assert pagination.make_page([], crud.HALL_ORDER, 10) == pagination.Page([], None)
+    assert pagination.make_page(rows, crud.HALL_ORDER, 0) == pagination.Page([], None)
@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import models
+from app.database import SessionLocal, async_engine
+
+pytestmark = pytest.mark.anyio
+
+LIMITS = (1, 10, 50)
+ROWS = 60
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+@pytest.fixture(scope="module")
+def listings(make_users, make_session):
+    # У каждого сеанса свои фильм и зал, у покупателя по билету на сеанс,
+    # у одного фильма отзывы от разных пользователей
+    session_ids = [make_session() for _ in range(ROWS)]
+    (buyer_id, buyer), = make_users(1)
+    reviewers = make_users(ROWS)
+    with SessionLocal() as db:
+        movie_id = db.get(models.Session, session_ids[0]).movie_id
+        db.add_all(
+            models.Ticket(session_id=session_id, user_id=buyer_id, seat_number="A1", price=300.0)
+            for session_id in session_ids
+        )
+        db.add_all(
+            models.Review(movie_id=movie_id, user_id=user_id, rating=7, comment="ok") for user_id, _ in reviewers
+        )
+        db.commit()
+    return {
+        "sessions": ("/api/sessions/", None),
+        "my_tickets": ("/api/tickets/my", buyer),
+        "movie_reviews": (f"/api/reviews/movie/{movie_id}", None),
+    }
+
+@pytest.mark.parametrize("listing", ["sessions", "my_tickets", "movie_reviews"])
+async def test_query_count_does_not_grow_with_limit(client, listings, listing):
+    path, headers = listings[listing]
+    # Первый запрос прогревает кэш пользователей, дальше считаются только запросы списка
+    assert (await client.get(path, params={"limit": 1}, headers=headers)).status_code == 200
+
+    counts = {}
+    for limit in LIMITS:
+        with count_queries() as statements:
+            response = await client.get(path, params={"limit": limit}, headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()) == limit
+        counts[limit] = len(statements)
+
+    assert len(set(counts.values())) == 1, f"{path}: queries per limit {counts}"
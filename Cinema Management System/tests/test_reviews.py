@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from app import crud, models
+from app.database import AsyncSessionLocal, SessionLocal
+
+pytestmark = pytest.mark.anyio
+
+RATINGS = [10, 8, 8, 3, 7, 8]
+
+@pytest.fixture
+def movie_id():
+    with SessionLocal() as db:
+        movie = models.Movie(title="Reviewed movie", genre="drama", duration=100, rating=7.0)
+        db.add(movie)
+        db.commit()
+        return movie.id
+
+async def review(client, headers, movie_id, rating):
+    return await client.post("/api/reviews/", json={"movie_id": movie_id, "rating": rating, "comment": "ok"}, headers=headers)
+
+async def stats(client, movie_id):
+    response = await client.get(f"/api/movies/{movie_id}/stats")
+    assert response.status_code == 200
+    return response.json()
+
+def expected(ratings):
+    return {
+        "review_count": len(ratings),
+        "review_sum": sum(ratings),
+        "audience_score": pytest.approx(sum(ratings) / len(ratings)),
+        "histogram": {str(rating): ratings.count(rating) for rating in range(1, 11)},
+    }
+
+async def test_concurrent_reviews_update_aggregates(client, make_users, movie_id):
+    users = make_users(len(RATINGS))
+    assert (await stats(client, movie_id))["audience_score"] == 0
+    assert (await client.get(f"/api/movies/{movie_id}")).json()["review_count"] == 0
+
+    responses = await asyncio.gather(*(
+        review(client, headers, movie_id, rating) for (_, headers), rating in zip(users, RATINGS)
+    ))
+    assert [response.status_code for response in responses] == [200] * len(RATINGS)
+
+    result = await stats(client, movie_id)
+    assert {key: result[key] for key in expected(RATINGS)} == expected(RATINGS)
+    # Кэшированная карточка фильма сброшена вместе с записью
+    movie = (await client.get(f"/api/movies/{movie_id}")).json()
+    assert movie["review_count"] == len(RATINGS)
+    assert movie["audience_score"] == pytest.approx(sum(RATINGS) / len(RATINGS))
+
+async def test_rejected_reviews_do_not_count(client, make_users, movie_id):
+    (_, headers), = make_users(1)
+    assert (await review(client, headers, movie_id, 9)).status_code == 200
+    assert (await review(client, headers, movie_id, 1)).status_code == 400
+    for rating in (0, 11):
+        assert (await review(client, headers, movie_id, rating)).status_code == 400
+    result = await stats(client, movie_id)
+    assert {key: result[key] for key in expected([9])} == expected([9])
+
+async def test_rebuild_restores_drifted_aggregates(client, make_users, movie_id):
+    for (_, headers), rating in zip(make_users(len(RATINGS)), RATINGS):
+        assert (await review(client, headers, movie_id, rating)).status_code == 200
+    with SessionLocal() as db:
+        movie = db.get(models.Movie, movie_id)
+        movie.review_count, movie.review_sum, movie.audience_score = 1, 1, 1.0
+        db.query(models.ReviewHistogram).filter(models.ReviewHistogram.movie_id == movie_id).delete()
+        db.commit()
+
+    async with AsyncSessionLocal() as db:
+        await crud.rebuild_review_stats(db)
+    result = await stats(client, movie_id)
+    assert {key: result[key] for key in expected(RATINGS)} == expected(RATINGS)
+
+async def test_unknown_movie_stats(client):
+    assert (await client.get(f"/api/movies/{10 ** 9}/stats")).status_code == 404
@@ -0,0 +1,72 @@
+import pytest
+
+from app import models, search
+from app.database import SessionLocal
+
+pytestmark = pytest.mark.anyio
+
+def add_movies(*movies):
+    with SessionLocal() as db:
+        rows = [models.Movie(duration=100, rating=7.0, **movie) for movie in movies]
+        db.add_all(rows)
+        db.commit()
+        return [row.id for row in rows]
+
+async def test_genre_filter_matches_substring(client):
+    sci_fi, = add_movies({"title": "Orbit", "genre": "Qwyx-Sci-Fi"})
+    add_movies({"title": "Harbor", "genre": "Qwyx-Drama"})
+    for genre in ("ci-f", "QWYX-SCI", "sci-fi"):
+        response = await client.get("/api/movies/", params={"genre": genre, "limit": 100})
+        assert response.status_code == 200
+        assert sci_fi in [movie["id"] for movie in response.json()]
+    response = await client.get("/api/movies/", params={"genre": "qwyx", "limit": 100})
+    assert len(response.json()) == 2
+
+async def find(client, q):
+    response = await client.get("/api/movies/search", params={"q": q})
+    assert response.status_code == 200
+    return [movie["id"] for movie in response.json()]
+
+async def test_title_match_ranks_above_description(client):
+    in_description, in_title = add_movies(
+        {"title": "Harbor lights", "genre": "drama", "description": "A story about the zorvane lighthouse"},
+        {"title": "Zorvane", "genre": "drama", "description": "Keeper of the light"},
+    )
+    assert await find(client, "zorvane") == [in_title, in_description]
+
+async def test_prefix_matching(client):
+    movie_id, = add_movies({"title": "Kvellstrom Odyssey", "genre": "adventure"})
+    for q in ("kv", "kvel", "KVELLSTROM od", "odyss kvell"):
+        assert movie_id in await find(client, q)
+    assert await find(client, "kvellstromx") == []
+
+async def test_cyrillic_and_diacritics(client):
+    dune, amelie = add_movies(
+        {"title": "Дюнаэль: Пророчество", "genre": "фантастика"},
+        {"title": "Le fabuleux destin d'Amélietta", "genre": "comedy"},
+    )
+    assert await find(client, "дюнаэ") == [dune]
+    assert await find(client, "ДЮНАЭЛЬ пророч") == [dune]
+    assert await find(client, "amelietta") == [amelie]
+
+async def test_index_follows_sql_updates_and_deletes(client):
+    assert search.fts_enabled
+    movie_id, = add_movies({"title": "Brumvaldt", "genre": "drama"})
+    with SessionLocal() as db:
+        db.get(models.Movie, movie_id).title = "Quorsingale"
+        db.commit()
+    assert await find(client, "brumvaldt") == []
+    assert await find(client, "quorsingale") == [movie_id]
+    with SessionLocal() as db:
+        db.delete(db.get(models.Movie, movie_id))
+        db.commit()
+    assert await find(client, "quorsingale") == []
+
+async def test_like_fallback(client, monkeypatch):
+    in_description, in_title = add_movies(
+        {"title": "Harbor nights", "genre": "drama", "description": "The plindrove affair"},
+        {"title": "Plindrove", "genre": "drama"},
+    )
+    monkeypatch.setattr(search, "fts_enabled", False)
+    assert await find(client, "plindro") == [in_title, in_description]
+    assert await find(client, "PLINDROVE affair") == [in_description]
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import event, update
+
+from app import models, seats
+from app.database import SessionLocal, async_engine
+
+pytestmark = pytest.mark.anyio
+
+async def test_seat_map_picks_up_sales_from_other_workers(client, make_users, make_session, monkeypatch):
+    session_id = make_session()
+    (_, buyer), = make_users(1)
+    (other_id, _), = make_users(1)
+    response = await client.post("/api/tickets/", json={"session_id": session_id, "seat_number": "A1"}, headers=buyer)
+    assert response.status_code == 200
+    assert (await client.get(f"/api/sessions/{session_id}/seats")).json()["taken"] == 1
+
+    # Другой воркер продает место: в его памяти карта обновилась, в этой - нет
+    with SessionLocal() as db:
+        db.add(models.Ticket(session_id=session_id, user_id=other_id, seat_number="A2", price=300.0))
+        db.execute(
+            update(models.SessionSales)
+            .where(models.SessionSales.session_id == session_id)
+            .values(tickets_sold=models.SessionSales.tickets_sold + 1)
+        )
+        db.commit()
+    assert (await client.get(f"/api/sessions/{session_id}/seats")).json()["taken"] == 1
+
+    # Устаревшая карта сверяется с session_sales и перестраивается
+    monkeypatch.setattr(seats, "SEAT_MAP_TTL", 0)
+    seat_map = (await client.get(f"/api/sessions/{session_id}/seats")).json()
+    assert seat_map["taken"] == 2
+    assert seat_map["rows"][0]["seats"].startswith("11")
+
+    # Без новых продаж сверка оставляет карту в памяти
+    revalidated = seats.stats["revalidated"]
+    assert (await client.get(f"/api/sessions/{session_id}/seats")).json()["taken"] == 2
+    assert seats.stats["revalidated"] == revalidated + 1
+
+async def test_sale_during_load_is_not_cached_and_nothing_is_left_behind(client, make_users, make_session):
+    session_id = make_session()
+    (_, buyer), = make_users(1)
+
+    # Покупка в этом же воркере, пока карта читается из БД
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT tickets.seat_number"):
+            seats.mark_taken(session_id, 0)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        assert (await client.get(f"/api/sessions/{session_id}/seats")).status_code == 200
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    assert session_id not in seats._seat_maps
+
+    for seat_number in ("A1", "A2", "A3"):
+        response = await client.post(
+            "/api/tickets/", json={"session_id": session_id, "seat_number": seat_number}, headers=buyer
+        )
+        assert response.status_code == 200
+        assert (await client.get(f"/api/sessions/{session_id}/seats")).status_code == 200
+    assert seats._seat_maps[session_id].taken == 3
+    # Счетчики записей хранятся только на время загрузки карты
+    assert seats._versions == {}
+    assert seats._loading == {}
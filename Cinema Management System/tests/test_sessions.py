@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app import crud, models
+from app.database import SessionLocal, async_engine
+
+pytestmark = pytest.mark.anyio
+
+def session_slot(session_id):
+    with SessionLocal() as db:
+        session = db.get(models.Session, session_id)
+        return session.movie_id, session.hall_id
+
+def hall_schedule(hall_id):
+    with SessionLocal() as db:
+        # Сеанс из make_session создан в обход crud и строки продаж не имеет
+        sessions = db.query(models.Session.id).filter(models.Session.hall_id == hall_id).count()
+        sales = db.query(models.SessionSales.session_id).filter(models.SessionSales.hall_id == hall_id).count()
+        return sessions, sales
+
+def import_rows(movie_id, hall_id, count=5):
+    # Сеансы раз в три часа; по IMPORT_CHUNK_SIZE = 2 пять строк вставляются тремя пачками
+    return [
+        {"movie_id": movie_id, "hall_id": hall_id, "start_time": f"2031-06-01T{8 + 3 * i:02d}:00:00", "price": 300}
+        for i in range(count)
+    ]
+
+async def test_csv_import_reports_rows_with_extra_fields(client, make_users, make_session):
+    (_, admin), = make_users(1, role="admin")
+    movie_id, hall_id = session_slot(make_session())
+    body = "\n".join([
+        "movie_id,hall_id,start_time,price",
+        f"{movie_id},{hall_id},2031-03-01T10:00:00,300",
+        f"{movie_id},{hall_id},2031-03-01T14:00:00,300,extra",
+        f"{movie_id},{hall_id},2031-03-01T18:00:00,300",
+    ])
+
+    response = await client.post(
+        "/api/sessions/bulk",
+        params={"partial": "true"},
+        content=body,
+        headers={**admin, "Content-Type": "text/csv"},
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["created"] == 2
+    assert result["errors"] == [{"row": 2, "error": "Row has more fields than the header"}]
+    with SessionLocal() as db:
+        start_times = {
+            session.id: session.start_time.hour
+            for session in db.query(models.Session).filter(models.Session.id.in_(result["ids"]))
+        }
+    assert [start_times[session_id] for session_id in result["ids"]] == [10, 18]
+
+async def test_concurrent_overlapping_sessions_in_one_hall(client, make_users, make_session):
+    (_, admin), = make_users(1, role="admin")
+    movie_id, hall_id = session_slot(make_session())
+
+    # Фильм идет 120 минут: любые два сеанса с разницей в 10 минут пересекаются
+    responses = await asyncio.gather(*(
+        client.post(
+            "/api/sessions/",
+            json={"movie_id": movie_id, "hall_id": hall_id, "start_time": f"2031-04-01T10:{minute:02d}:00", "price": 300},
+            headers=admin,
+        )
+        for minute in range(0, 60, 10)
+    ))
+
+    assert sorted(response.status_code for response in responses) == [200] + [409] * 5
+
+async def test_longer_movie_must_fit_its_sessions(client, make_users, make_session):
+    (_, admin), = make_users(1, role="admin")
+    movie_id, hall_id = session_slot(make_session())
+    for start_time in ("2031-05-01T10:00:00", "2031-05-01T12:30:00"):
+        response = await client.post(
+            "/api/sessions/",
+            json={"movie_id": movie_id, "hall_id": hall_id, "start_time": start_time, "price": 300},
+            headers=admin,
+        )
+        assert response.status_code == 200
+
+    # Сеансы через 150 минут: 150 минут помещаются, 151 - нет
+    response = await client.put(f"/api/movies/{movie_id}", json={"duration": 151}, headers=admin)
+    assert response.status_code == 409
+    response = await client.put(f"/api/movies/{movie_id}", json={"duration": 150}, headers=admin)
+    assert response.status_code == 200
+    assert response.json()["duration"] == 150
+
+async def test_import_error_in_a_later_chunk_inserts_nothing(client, make_users, make_session, monkeypatch):
+    monkeypatch.setattr(crud, "IMPORT_CHUNK_SIZE", 2)
+    (_, admin), = make_users(1, role="admin")
+    movie_id, hall_id = session_slot(make_session())
+    rows = import_rows(movie_id, hall_id)
+    rows[4]["hall_id"] = 10 ** 9
+
+    response = await client.post("/api/sessions/bulk", json=rows, headers=admin)
+    assert response.status_code == 400
+    assert response.json() == {"created": 0, "ids": [], "errors": [{"row": 5, "error": "Hall not found"}]}
+    assert hall_schedule(hall_id) == (1, 0)
+
+    response = await client.post("/api/sessions/bulk", params={"partial": "true"}, json=rows, headers=admin)
+    assert response.status_code == 200
+    assert response.json()["created"] == 4
+    assert hall_schedule(hall_id) == (5, 4)
+
+async def test_failed_chunk_rolls_back_earlier_chunks(client, make_users, make_session, monkeypatch):
+    monkeypatch.setattr(crud, "IMPORT_CHUNK_SIZE", 2)
+    (_, admin), = make_users(1, role="admin")
+    movie_id, hall_id = session_slot(make_session())
+    inserts = []
+
+    # Вторая пачка падает в БД, когда первая уже вставлена в той же транзакции
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO sessions"):
+            inserts.append(statement)
+            if len(inserts) == 2:
+                raise OperationalError(statement, parameters, Exception("disk I/O error"))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = await client.post("/api/sessions/bulk", json=import_rows(movie_id, hall_id), headers=admin)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == 500
+    assert len(inserts) == 2
+    assert hall_schedule(hall_id) == (1, 0)
+
+async def test_import_looks_up_movies_and_halls_in_chunks(client, make_users, make_session, monkeypatch):
+    monkeypatch.setattr(crud, "IMPORT_CHUNK_SIZE", 2)
+    (_, admin), = make_users(1, role="admin")
+    slots = [session_slot(make_session()) for _ in range(5)]
+    rows = [
+        {"movie_id": movie_id, "hall_id": hall_id, "start_time": "2031-07-01T10:00:00", "price": 300}
+        for movie_id, hall_id in slots
+    ]
+    lookups = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(("SELECT movies.id, movies.duration", "SELECT halls.id, halls.capacity")):
+            lookups.append(len(parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = await client.post("/api/sessions/bulk", json=rows, headers=admin)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 5
+    # По три запроса на фильмы и на залы, не больше двух id в каждом
+    assert sorted(lookups) == [1, 1, 2, 2, 2, 2]
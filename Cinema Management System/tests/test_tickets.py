@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from app import crud, models
+from app.database import AsyncSessionLocal, SessionLocal
+
+pytestmark = pytest.mark.anyio
+
+BUYERS = 20
+
+def sold(session_id):
+    with SessionLocal() as db:
+        return sorted(
+            seat for (seat,) in db.query(models.Ticket.seat_number).filter(models.Ticket.session_id == session_id)
+        )
+
+async def test_concurrent_purchase_of_one_seat(client, make_users, make_session):
+    session_id = make_session()
+    buyers = make_users(BUYERS)
+
+    responses = await asyncio.gather(*(
+        client.post("/api/tickets/", json={"session_id": session_id, "seat_number": "A1"}, headers=headers)
+        for _, headers in buyers
+    ))
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200] + [400] * (BUYERS - 1)
+    assert sold(session_id) == ["A1"]
+
+async def test_concurrent_batch_purchase_of_one_seat(client, make_users, make_session):
+    session_id = make_session()
+    buyers = make_users(BUYERS)
+
+    # Каждый заказ - общее место A1 и свое место в ряду B: выигравший заказ продается целиком,
+    # проигравшие не оставляют проданных мест
+    responses = await asyncio.gather(*(
+        client.post(
+            "/api/tickets/batch",
+            json={"session_id": session_id, "seat_numbers": ["A1", f"B{number + 1}"]},
+            headers=headers,
+        )
+        for number, (_, headers) in enumerate(buyers)
+    ))
+
+    statuses = [response.status_code for response in responses]
+    assert sorted(statuses) == [200] + [400] * (BUYERS - 1)
+    winner = statuses.index(200)
+    assert sold(session_id) == ["A1", f"B{winner + 1}"]
+    assert {ticket["seat_number"] for ticket in responses[winner].json()} == {"A1", f"B{winner + 1}"}
+
+async def test_rebuilt_revenue_uses_price_paid(client, make_users, make_session):
+    session_id = make_session(price=300.0)
+    (_, buyer), = make_users(1)
+    (_, admin), = make_users(1, role="admin")
+
+    response = await client.post("/api/tickets/", json={"session_id": session_id, "seat_number": "A1"}, headers=buyer)
+    assert response.status_code == 200
+    assert response.json()["price"] == 300.0
+    response = await client.put(f"/api/sessions/{session_id}", json={"price": 500.0}, headers=admin)
+    assert response.status_code == 200
+
+    async with AsyncSessionLocal() as db:
+        await crud.rebuild_sales(db)
+        sales = await db.get(models.SessionSales, session_id)
+    assert (sales.tickets_sold, sales.revenue) == (1, 300.0)
+
+async def test_rebuilt_sales_match_incremental_rows(client, make_users, make_session):
+    sold_id, unsold_id = make_session(capacity=40, rows=4, price=250.0), make_session(capacity=30, rows=3)
+    (_, buyer), = make_users(1)
+    response = await client.post(
+        "/api/tickets/batch", json={"session_id": sold_id, "seat_numbers": ["A1", "B2"]}, headers=buyer
+    )
+    assert response.status_code == 200
+
+    columns = ("session_id", "movie_id", "hall_id", "day", "capacity", "tickets_sold", "revenue")
+    with SessionLocal() as db:
+        incremental = {column: getattr(db.get(models.SessionSales, sold_id), column) for column in columns}
+        unsold = db.get(models.Session, unsold_id)
+        expected_unsold = (unsold.movie_id, unsold.hall_id, unsold.start_time.date(), 30, 0, 0.0)
+
+    async with AsyncSessionLocal() as db:
+        assert await crud.rebuild_sales(db) >= 2
+    with SessionLocal() as db:
+        rebuilt = db.get(models.SessionSales, sold_id)
+        assert {column: getattr(rebuilt, column) for column in columns} == incremental
+        sales = db.get(models.SessionSales, unsold_id)
+        assert (
+            sales.movie_id, sales.hall_id, sales.day, sales.capacity, sales.tickets_sold, sales.revenue
+        ) == expected_unsold
+
+@pytest.mark.parametrize("seat_number", ["", "A", "1A", "A0", "A11", "F1", "A1B", "AA1"])
+async def test_invalid_seat_number(client, make_users, make_session, seat_number):
+    session_id = make_session(capacity=50, rows=5)
+    (_, buyer), = make_users(1)
+    response = await client.post("/api/tickets/", json={"session_id": session_id, "seat_number": seat_number}, headers=buyer)
+    assert response.status_code == 400
+    assert sold(session_id) == []
+
+async def test_seat_number_is_normalized(client, make_users, make_session):
+    session_id = make_session(capacity=50, rows=5)
+    (_, buyer), (_, other) = make_users(2)
+    response = await client.post("/api/tickets/", json={"session_id": session_id, "seat_number": " e10 "}, headers=buyer)
+    assert response.status_code == 200
+    assert response.json()["seat_number"] == "E10"
+    # То же место в другом написании уже продано
+    response = await client.post("/api/tickets/", json={"session_id": session_id, "seat_number": "E10"}, headers=other)
+    assert response.status_code == 400
+
+async def test_last_row_is_cut_at_capacity(client, make_users, make_session):
+    # 47 мест в 5 рядах по 10: в ряду E только места 1-7
+    session_id = make_session(capacity=47, rows=5)
+    (_, buyer), = make_users(1)
+    response = await client.post(
+        "/api/tickets/batch", json={"session_id": session_id, "seat_numbers": ["E7", "E8"]}, headers=buyer
+    )
+    assert response.status_code == 400
+    response = await client.post(
+        "/api/tickets/batch", json={"session_id": session_id, "seat_numbers": ["D10", "E7"]}, headers=buyer
+    )
+    assert response.status_code == 200
+    assert sold(session_id) == ["D10", "E7"]
+
+@pytest.mark.parametrize("seat_numbers", [[], ["A1", "a1"], [f"A{number}" for number in range(1, 11)] + ["B1"]])
+async def test_invalid_batch(client, make_users, make_session, seat_numbers):
+    session_id = make_session()
+    (_, buyer), = make_users(1)
+    response = await client.post(
+        "/api/tickets/batch", json={"session_id": session_id, "seat_numbers": seat_numbers}, headers=buyer
+    )
+    assert response.status_code == 400
+    assert sold(session_id) == []
+
+async def test_batch_with_a_sold_seat_sells_nothing(client, make_users, make_session):
+    session_id = make_session()
+    (_, first), (_, second) = make_users(2)
+    response = await client.post("/api/tickets/", json={"session_id": session_id, "seat_number": "B2"}, headers=first)
+    assert response.status_code == 200
+    response = await client.post(
+        "/api/tickets/batch", json={"session_id": session_id, "seat_numbers": ["B1", "B2", "B3"]}, headers=second
+    )
+    assert response.status_code == 400
+    assert sold(session_id) == ["B2"]
+
+async def test_unknown_session(client, make_users):
+    (_, buyer), = make_users(1)
+    response = await client.post("/api/tickets/batch", json={"session_id": 10 ** 9, "seat_numbers": ["A1"]}, headers=buyer)
+    assert response.status_code == 404